@@ -0,0 +1,182 @@
+# archive_writer.py
+
+import atexit
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+import cv2
+
+import config
+
+_SHARD = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+THUMBS_DIR = "thumbs"
+
+
+class ArchiveWriter:
+    """Writes captured frames to disk on a background thread so capture never waits on imwrite.
+
+    The queue is bounded: if the disk stalls long enough to fill it, new frames are
+    dropped (and counted) rather than blocking the capture path. Frames can be
+    re-encoded (JPEG/WebP quality, downscale, separate thumbnail), and while idle the
+    writer applies the retention policy to the dated folders of the archive.
+    """
+
+    def __init__(self, folder=None, maxsize=None):
+        self.folder = folder or config.ARCHIVE_DIR
+        self._queue = queue.Queue(maxsize=maxsize or config.ARCHIVE_QUEUE_SIZE)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._shard_bytes = {}
+        self._last_retention = 0.0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.deleted = 0
+
+    def submit(self, filename, frame):
+        """Queue `frame` to be written to `filename`; returns False if the queue was full"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((filename, frame))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ Archive queue full, not saving {filename}")
+            return False
+
+    def flush(self):
+        """Block until every queued frame has been written"""
+        if self._thread:
+            self._queue.join()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ecospy-archive", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                filename, frame = self._queue.get(timeout=5)
+            except queue.Empty:
+                if time.monotonic() - self._last_retention >= config.ARCHIVE_RETENTION_SECONDS:
+                    self.apply_retention()
+                continue
+            try:
+                self._write(filename, frame)
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Failed to save {filename}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, filename, frame):
+        image = _downscale(frame, config.ARCHIVE_MAX_SIDE)
+        ok, data = cv2.imencode(os.path.splitext(filename)[1] or ".jpg", image, _encode_params(filename))
+        if not ok:
+            raise IOError("encoding failed")
+        with open(filename, "wb") as f:
+            f.write(data.tobytes())
+
+        if config.ARCHIVE_THUMBNAIL_SIDE:
+            directory, name = os.path.split(filename)
+            thumb_dir = os.path.join(directory, THUMBS_DIR)
+            os.makedirs(thumb_dir, exist_ok=True)
+            thumb = _downscale(frame, config.ARCHIVE_THUMBNAIL_SIDE)
+            cv2.imwrite(os.path.join(thumb_dir, os.path.splitext(name)[0] + ".jpg"), thumb,
+                        [cv2.IMWRITE_JPEG_QUALITY, 70])
+
+    def apply_retention(self):
+        """Delete dated folders older than ARCHIVE_MAX_AGE_DAYS, then the oldest captures
+        until the archive fits in ARCHIVE_MAX_TOTAL_MB"""
+        self._last_retention = time.monotonic()
+        if not (config.ARCHIVE_MAX_AGE_DAYS or config.ARCHIVE_MAX_TOTAL_MB) or not os.path.isdir(self.folder):
+            return
+        shards = sorted(e.name for e in os.scandir(self.folder) if e.is_dir() and _SHARD.match(e.name))
+
+        if config.ARCHIVE_MAX_AGE_DAYS:
+            cutoff = (datetime.now() - timedelta(days=config.ARCHIVE_MAX_AGE_DAYS)).strftime("%Y-%m-%d")
+            for shard in [s for s in shards if s < cutoff]:
+                shutil.rmtree(os.path.join(self.folder, shard), ignore_errors=True)
+                self._shard_bytes.pop(shard, None)
+                shards.remove(shard)
+                print(f"🧹 Removed archive folder {shard} (older than {config.ARCHIVE_MAX_AGE_DAYS} days)")
+
+        if config.ARCHIVE_MAX_TOTAL_MB:
+            budget = config.ARCHIVE_MAX_TOTAL_MB * 1024 * 1024
+            today = datetime.now().strftime("%Y-%m-%d")
+            for shard in shards:
+                # past days no longer change, so only today's folder is re-measured
+                if shard == today or shard not in self._shard_bytes:
+                    self._shard_bytes[shard] = _dir_size(os.path.join(self.folder, shard))
+            total = sum(self._shard_bytes.get(s, 0) for s in shards)
+            for shard in shards:
+                if total <= budget:
+                    break
+                total -= self._trim_shard(shard, total - budget)
+
+    def _trim_shard(self, shard, excess):
+        """Delete the oldest captures of `shard` until `excess` bytes are freed; returns bytes freed"""
+        path = os.path.join(self.folder, shard)
+        files = sorted((e for e in os.scandir(path) if e.is_file()), key=lambda e: e.stat().st_mtime)
+        freed = 0
+        for entry in files:
+            if freed >= excess:
+                break
+            size = entry.stat().st_size
+            os.remove(entry.path)
+            thumb = os.path.join(path, THUMBS_DIR, os.path.splitext(entry.name)[0] + ".jpg")
+            if os.path.exists(thumb):
+                size += os.path.getsize(thumb)
+                os.remove(thumb)
+            freed += size
+            self.deleted += 1
+        if freed < excess:
+            shutil.rmtree(path, ignore_errors=True)
+            self._shard_bytes.pop(shard, None)
+        else:
+            self._shard_bytes[shard] = self._shard_bytes.get(shard, 0) - freed
+        print(f"🧹 Freed {freed / 1024 / 1024:.1f} MB from archive folder {shard}")
+        return freed
+
+
+def _downscale(frame, max_side):
+    h, w = frame.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return frame
+    scale = max_side / max(h, w)
+    return cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def _encode_params(filename):
+    if filename.lower().endswith(".webp"):
+        return [cv2.IMWRITE_WEBP_QUALITY, config.ARCHIVE_QUALITY]
+    return [cv2.IMWRITE_JPEG_QUALITY, config.ARCHIVE_QUALITY]
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+archive_writer = ArchiveWriter()
+atexit.register(archive_writer.flush)
+
+
+if __name__ == "__main__":
+    print(f"🧹 Applying retention to {archive_writer.folder}")
+    archive_writer.apply_retention()
+    print(f"🧹 Deleted {archive_writer.deleted} captures")
@@ -0,0 +1,66 @@
+# asset_cache.py
+
+import functools
+import os
+import threading
+import time
+
+from PIL import Image, ImageTk
+
+BACKGROUNDS = ["Ecospy_bg.jpg", "Ecospy.jpg", "eco.jpg"]
+
+
+class AssetCache:
+    """Background images decoded and scaled once for the current screen geometry.
+
+    preload() does the JPEG decode and resample on a background thread; photo()
+    is called on the Tk thread and turns the scaled image into a PhotoImage the
+    first time it is needed, then hands out the same PhotoImage on every screen.
+    """
+
+    def __init__(self, size, paths=BACKGROUNDS):
+        self.size = size
+        self.paths = list(paths)
+        self._scaled = {}
+        self._photos = {}
+        self._ready = threading.Event()
+        self._thread = None
+
+    def preload(self):
+        self._thread = threading.Thread(target=self._load_all, name="ecospy-assets", daemon=True)
+        self._thread.start()
+
+    def photo(self, path):
+        """Ready-made PhotoImage for `path` at screen size, or None if the file is missing"""
+        if path in self._photos:
+            return self._photos[path]
+        if self._thread is not None:
+            self._ready.wait()
+        scaled = self._scaled.get(path) or _load_scaled(path, self.size)
+        photo = ImageTk.PhotoImage(scaled) if scaled is not None else None
+        self._photos[path] = photo
+        return photo
+
+    def _load_all(self):
+        for path in self.paths:
+            self._scaled[path] = _load_scaled(path, self.size)
+        self._ready.set()
+
+
+def _load_scaled(path, size):
+    if not os.path.exists(path):
+        return None
+    with Image.open(path) as img:
+        return img.convert("RGB").resize(size)
+
+
+def timed_transition(screen):
+    """Log how long a screen function takes to build its widgets"""
+    @functools.wraps(screen)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return screen(*args, **kwargs)
+        finally:
+            print(f"⏱️ {screen.__name__}: {(time.perf_counter() - start) * 1000:.1f} ms")
+    return wrapper
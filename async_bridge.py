@@ -0,0 +1,31 @@
+# async_bridge.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ecospy-io")
+
+
+def run_async(root, fn, *args, on_done=None, on_error=None, poll_ms=20):
+    """Run `fn(*args)` on a worker thread and deliver the outcome on the Tk thread.
+
+    Tk is not thread-safe, so the worker never touches widgets: the Tk loop polls
+    the future with `root.after` and calls `on_done(result)` or `on_error(exc)`
+    once it finishes. Returns the future.
+    """
+    future = _executor.submit(fn, *args)
+
+    def poll():
+        if not future.done():
+            root.after(poll_ms, poll)
+            return
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                print(f"❌ Background task failed: {error}")
+        elif on_done:
+            on_done(future.result())
+
+    root.after(poll_ms, poll)
+    return future
@@ -0,0 +1,158 @@
+# benchmark.py
+# Replay recorded footage through capture -> infer -> filter -> payout against the
+# in-memory Firestore and print machine-readable timings. No camera or network needed.
+#
+#   python benchmark.py recordings/bin1.mp4 --frames 500 --output bench.json
+#   python benchmark.py waste_collected/ --payout-every 10
+
+import os
+
+# must be set before config is imported; export ECOSPY_FIRESTORE_BACKEND=firebase to hit the real backend
+os.environ.setdefault("ECOSPY_FIRESTORE_BACKEND", "memory")
+
+import argparse
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import config
+from detection_module import iter_image_paths
+from main import calculate_payout, commit_payouts, db
+from model_registry import get_model, load_info, model_path, resident_memory_mb
+from waste_mapping import RECYCLABLE_ITEMS, summarize_detections
+
+STAGES = ["capture", "infer", "filter", "payout"]
+BENCH_USER = "users/benchmark-user"
+
+
+def seed_backend(db):
+    """Prices for every recyclable label and one user, so payouts exercise the normal code path"""
+    if not hasattr(db, "load"):
+        return
+    documents = {f"recyclable_items/{item}": {"price": 10, "weight": 0.05, "type": "Plastic"}
+                 for item in RECYCLABLE_ITEMS}
+    documents[BENCH_USER] = {"name": "Benchmark", "email": "bench@example.com", "ecopoints": 0,
+                             "wastecollected": 0.0, "historyCount": 0}
+    db.load(documents)
+
+
+def iter_frames(source):
+    """Yield decoded BGR frames from a video file or an image folder"""
+    if os.path.isdir(source):
+        for path in iter_image_paths(source):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield frame
+        return
+    cap = cv2.VideoCapture(source)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield frame
+    finally:
+        cap.release()
+
+
+def _percentiles(samples_ms):
+    if not samples_ms:
+        return None
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {"count": len(samples_ms), "mean_ms": float(np.mean(samples_ms)),
+            "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return resident_memory_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run(sources, max_frames=None, payout_every=30, imgsz=None, allowed=None):
+    imgsz = imgsz or config.INFERENCE_IMGSZ
+    seed_backend(db)
+    model = get_model()
+    user_ref = db.document(BENCH_USER)
+
+    samples = {stage: [] for stage in STAGES}
+    basket = {}
+    frames = payouts = 0
+    cpu_start = os.times()
+    wall_start = time.perf_counter()
+
+    for source in sources:
+        frame_iter = iter_frames(source)
+        while max_frames is None or frames < max_frames:
+            t0 = time.perf_counter()
+            frame = next(frame_iter, None)
+            if frame is None:
+                break
+            t1 = time.perf_counter()
+            results = model(frame, imgsz=imgsz, verbose=False)
+            t2 = time.perf_counter()
+            _, recyclable = summarize_detections(results[0], allowed=allowed)
+            t3 = time.perf_counter()
+            samples["capture"].append((t1 - t0) * 1000)
+            samples["infer"].append((t2 - t1) * 1000)
+            samples["filter"].append((t3 - t2) * 1000)
+            frames += 1
+
+            for k, v in recyclable.items():
+                basket[k] = basket.get(k, 0) + v
+            if payout_every and frames % payout_every == 0:
+                t4 = time.perf_counter()
+                total_payout, total_weight, waste_type = calculate_payout(db, basket)
+                commit_payouts(db, [{"user_ref": user_ref, "points": total_payout,
+                                     "weight": total_weight, "waste_type": waste_type}])
+                samples["payout"].append((time.perf_counter() - t4) * 1000)
+                basket = {}
+                payouts += 1
+
+    wall = time.perf_counter() - wall_start
+    cpu_end = os.times()
+    cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    return {
+        "sources": sources,
+        "model": model_path(),
+        "imgsz": imgsz,
+        "frames": frames,
+        "payouts": payouts,
+        "wall_seconds": wall,
+        "fps": frames / wall if wall else 0.0,
+        "cpu_seconds": cpu,
+        "cpu_percent": 100 * cpu / wall if wall else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "model_load": load_info(),
+        "stages": {stage: _percentiles(values) for stage, values in samples.items()},
+        "backend": {"firestore": config.FIRESTORE_BACKEND,
+                    "reads": getattr(db, "reads", None), "writes": getattr(db, "writes", None)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded video/images through the EcoSpy pipeline")
+    parser.add_argument("sources", nargs="+", help="video files or image folders")
+    parser.add_argument("--frames", type=int, default=None, help="stop after this many frames")
+    parser.add_argument("--payout-every", type=int, default=30, help="commit a payout every N frames (0 = never)")
+    parser.add_argument("--imgsz", type=int, default=None)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.sources, max_frames=args.frames, payout_every=args.payout_every, imgsz=args.imgsz)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"📊 {report['frames']} frames at {report['fps']:.1f} FPS -> {args.output}")
+    else:
+        print(text)
@@ -2,55 +2,48 @@
 
 import cv2
 import os
-from ultralytics import YOLO
-from waste_mapping import check_recyclability
-
-# Load YOLO model
-model = YOLO("yolov8n.pt")
+from filename_allocator import allocate_filename
+from model_registry import get_model
+from waste_mapping import summarize_detections
+from archive_writer import archive_writer
+from motion_gate import MotionGate
+import config
 
 # Save folder for captured images
-folder = "waste_collected"
+folder = config.ARCHIVE_DIR
 os.makedirs(folder, exist_ok=True)
 
 def get_next_filename():
-    existing = [int(f.split(".")[0]) for f in os.listdir(folder) if f.endswith(".jpg")]
-    next_index = max(existing, default=0) + 1
-    return os.path.join(folder, f"{next_index}.jpg")
+    return allocate_filename(folder, ext=config.ARCHIVE_FORMAT)
 
 def capture_with_live_detection():
-    cap = cv2.VideoCapture(0)
+    model = get_model()
+    cap = cv2.VideoCapture(config.CAMERA_SOURCE)
     print("📷 Press 'P' to capture with detection, 'Q' to quit")
 
+    gate = MotionGate() if config.MOTION_GATE_ENABLED else None
     filename = None
+    results = None
     while True:
         ret, frame = cap.read()
         if not ret:
             break
 
-        # 🔹 Live YOLO detection on each frame
-        results = model(frame, verbose=False)
-        annotated = results[0].plot()
+        # 🔹 Live YOLO detection, skipped while the scene is static
+        if gate is None or gate.should_infer(frame) or results is None:
+            results = model(frame, verbose=False)
+        annotated = results[0].plot(img=frame)
 
         cv2.imshow("EcoSpy Live Detection", annotated)
         key = cv2.waitKey(1) & 0xFF
 
         if key == ord('p'):
             filename = get_next_filename()
-            cv2.imwrite(filename, frame)
-            print(f"✅ Captured & saved {filename}")
-
-            # 🔹 Run detection again on saved frame
-            results = model(filename, verbose=False)
-            all_items, recyclable_items = [], {}
-
-            for box in results[0].boxes:
-                cls = int(box.cls[0])
-                label = results[0].names[cls].lower()
-                all_items.append(label)
+            archive_writer.submit(filename, frame)
+            print(f"✅ Captured {filename}")
 
-                status = check_recyclability(label)
-                if status == "Recyclable":
-                    recyclable_items[label] = recyclable_items.get(label, 0) + 1
+            # 🔹 Reuse the live detections for this frame instead of re-reading the JPEG
+            all_items, recyclable_items = summarize_detections(results[0])
 
             print("\n♻️ Final Detection on Captured Image")
             print("All Detected Items:", all_items)
@@ -63,4 +56,7 @@ def capture_with_live_detection():
 
     cap.release()
     cv2.destroyAllWindows()
+    if gate:
+        print(gate.report())
+    archive_writer.flush()
     return filename
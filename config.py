@@ -0,0 +1,116 @@
+# config.py
+# Kiosk tuning knobs. Every value can be overridden with an ECOSPY_* environment variable.
+
+import os
+
+
+def _env(name, default, cast=str):
+    value = os.environ.get(f"ECOSPY_{name}")
+    if value is None:
+        return default
+    if cast is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return cast(value)
+
+
+# Motion gate: skip inference while the scene in front of the bin is static
+MOTION_GATE_ENABLED = _env("MOTION_GATE_ENABLED", True, bool)
+MOTION_THRESHOLD = _env("MOTION_THRESHOLD", 0.02, float)          # fraction of pixels that must change
+MOTION_PIXEL_DELTA = _env("MOTION_PIXEL_DELTA", 25, int)          # grey-level change that counts as "changed"
+MOTION_REFRESH_SECONDS = _env("MOTION_REFRESH_SECONDS", 2.0, float)  # force a fresh inference this often
+
+# Capture: reuse the live preview's detections if they are at most this old (seconds)
+CAPTURE_REUSE_MAX_AGE = _env("CAPTURE_REUSE_MAX_AGE", 0.5, float)
+
+# Pricing: how long the cached recyclable_items table is trusted without a listener update (seconds)
+PRICING_TTL_SECONDS = _env("PRICING_TTL_SECONDS", 3600.0, float)
+
+# User lookup: recently resolved users kept in memory per kiosk
+USER_CACHE_SIZE = _env("USER_CACHE_SIZE", 32, int)
+USER_CACHE_TTL_SECONDS = _env("USER_CACHE_TTL_SECONDS", 120.0, float)
+
+# Model: PyTorch weights and the backend to run them with
+# (torch, onnx, onnx-int8, openvino, openvino-int8 — see `python inference_backend.py export`)
+MODEL_WEIGHTS = _env("MODEL_WEIGHTS", "yolov8n.pt")
+MODEL_BACKEND = _env("MODEL_BACKEND", "torch")
+
+# Inference input size; frames are letterboxed to this by the model, independent of the screen size
+INFERENCE_IMGSZ = _env("INFERENCE_IMGSZ", 640, int)
+
+# Inference server (multi-camera sites): local address, auth key and cross-stream batching
+INFERENCE_SERVER_HOST = _env("INFERENCE_SERVER_HOST", "127.0.0.1")
+INFERENCE_SERVER_PORT = _env("INFERENCE_SERVER_PORT", 6010, int)
+# frames never travel as pickles, but set your own key before listening beyond localhost
+INFERENCE_SERVER_AUTHKEY = _env("INFERENCE_SERVER_AUTHKEY", "ecospy").encode()
+INFERENCE_SERVER_MAX_BATCH = _env("INFERENCE_SERVER_MAX_BATCH", 8, int)
+INFERENCE_SERVER_MAX_WAIT_MS = _env("INFERENCE_SERVER_MAX_WAIT_MS", 5.0, float)
+# kiosk side: send preview/capture frames to that server instead of loading a model per kiosk
+INFERENCE_SERVER_ENABLED = _env("INFERENCE_SERVER_ENABLED", False, bool)
+INFERENCE_STREAM_NAME = _env("INFERENCE_STREAM_NAME", f"kiosk-{os.getpid()}")
+
+# Payout journal: local SQLite (WAL) queue flushed to Firestore in the background
+PAYOUT_JOURNAL_PATH = _env("PAYOUT_JOURNAL_PATH", "payout_journal.db")
+PAYOUT_FLUSH_BATCH = _env("PAYOUT_FLUSH_BATCH", 50, int)
+PAYOUT_RETRY_MAX_SECONDS = _env("PAYOUT_RETRY_MAX_SECONDS", 60.0, float)
+PAYOUT_MAX_ATTEMPTS = _env("PAYOUT_MAX_ATTEMPTS", 5, int)     # then parked as 'failed' so later payouts can flush
+PAYOUT_KEEP_DONE_DAYS = _env("PAYOUT_KEEP_DONE_DAYS", 7.0, float)  # confirmed entries are pruned after this
+
+# Backends: Firestore ("firebase", or "memory" for the in-memory stand-in) and the camera
+# (an index like 0, or a video file / stream URL to replay)
+FIRESTORE_BACKEND = _env("FIRESTORE_BACKEND", "firebase")
+FIREBASE_CREDENTIALS = _env("FIREBASE_CREDENTIALS", "serviceAccountKey.json")
+CAMERA_SOURCE = _env("CAMERA_SOURCE", "0")
+CAMERA_SOURCE = int(CAMERA_SOURCE) if CAMERA_SOURCE.isdigit() else CAMERA_SOURCE
+
+# Metrics: per-stage timing spans, an on-screen FPS/latency overlay and a Prometheus textfile
+METRICS_ENABLED = _env("METRICS_ENABLED", False, bool)
+METRICS_OVERLAY = _env("METRICS_OVERLAY", False, bool)
+METRICS_WINDOW = _env("METRICS_WINDOW", 300, int)                  # samples kept per stage
+METRICS_PROM_FILE = _env("METRICS_PROM_FILE", "")                  # e.g. /var/lib/node_exporter/textfile/ecospy.prom
+METRICS_EXPORT_SECONDS = _env("METRICS_EXPORT_SECONDS", 15.0, float)
+
+# Capture archive: encoding, thumbnails and retention for waste_collected/
+ARCHIVE_DIR = _env("ARCHIVE_DIR", "waste_collected")
+ARCHIVE_FORMAT = _env("ARCHIVE_FORMAT", "jpg")                     # jpg or webp
+ARCHIVE_QUALITY = _env("ARCHIVE_QUALITY", 85, int)
+ARCHIVE_MAX_SIDE = _env("ARCHIVE_MAX_SIDE", 0, int)                # downscale longest side to this (0 = keep)
+ARCHIVE_THUMBNAIL_SIDE = _env("ARCHIVE_THUMBNAIL_SIDE", 0, int)    # also write thumbs/N.jpg (0 = off)
+ARCHIVE_QUEUE_SIZE = _env("ARCHIVE_QUEUE_SIZE", 16, int)
+ARCHIVE_MAX_AGE_DAYS = _env("ARCHIVE_MAX_AGE_DAYS", 0, int)        # delete dated folders older than this (0 = keep)
+ARCHIVE_MAX_TOTAL_MB = _env("ARCHIVE_MAX_TOTAL_MB", 0, int)        # delete oldest captures above this (0 = no cap)
+ARCHIVE_RETENTION_SECONDS = _env("ARCHIVE_RETENTION_SECONDS", 600.0, float)
+
+# Duplicate captures: a capture within this perceptual-hash distance (0-15 bits out of 64) of an
+# earlier one in the session, with the same item counts, asks the user before counting again.
+# Plus the on-disk memo of detections per archived image used when re-scoring ("" = in memory only)
+DEDUP_ENABLED = _env("DEDUP_ENABLED", True, bool)
+DEDUP_MAX_DISTANCE = _env("DEDUP_MAX_DISTANCE", 6, int)
+DETECTION_MEMO_PATH = _env("DETECTION_MEMO_PATH", "detection_memo.jsonl")
+DETECTION_MEMO_SIZE = _env("DETECTION_MEMO_SIZE", 100000, int)
+
+# Detection log: append-only columnar store of every capture's boxes and every payout
+DETECTION_LOG_DIR = _env("DETECTION_LOG_DIR", "detection_log")
+DETECTION_LOG_CHUNK_ROWS = _env("DETECTION_LOG_CHUNK_ROWS", 65536, int)   # boxes per chunk before a flush/compaction target
+DETECTION_LOG_FLUSH_SECONDS = _env("DETECTION_LOG_FLUSH_SECONDS", 3600.0, float)  # also write a chunk this often
+DETECTION_LOG_COMPACT_AFTER = _env("DETECTION_LOG_COMPACT_AFTER", 16, int)  # merge small chunks beyond this many
+
+# History reports: documents fetched per page (and Parquet row group) when exporting wasteHistory
+HISTORY_PAGE_SIZE = _env("HISTORY_PAGE_SIZE", 500, int)
+
+# Headless pipeline (python main.py --headless): worker threads per stage, frames per model call
+# and the bound of every inter-stage queue
+HEADLESS_DECODE_WORKERS = _env("HEADLESS_DECODE_WORKERS", 2, int)
+HEADLESS_INFER_WORKERS = _env("HEADLESS_INFER_WORKERS", 1, int)
+HEADLESS_FILTER_WORKERS = _env("HEADLESS_FILTER_WORKERS", 1, int)
+HEADLESS_BATCH_SIZE = _env("HEADLESS_BATCH_SIZE", 4, int)
+HEADLESS_QUEUE_SIZE = _env("HEADLESS_QUEUE_SIZE", 8, int)
+
+# Adaptive quality: hold the live preview at a target FPS and share of all CPU cores by running
+# inference on every Nth frame, then shrinking imgsz, then raising the confidence threshold
+QUALITY_CONTROL_ENABLED = _env("QUALITY_CONTROL_ENABLED", True, bool)
+QUALITY_TARGET_FPS = _env("QUALITY_TARGET_FPS", 15.0, float)
+QUALITY_CPU_BUDGET = _env("QUALITY_CPU_BUDGET", 0.85, float)
+QUALITY_WINDOW_SECONDS = _env("QUALITY_WINDOW_SECONDS", 2.0, float)
+QUALITY_MAX_STRIDE = _env("QUALITY_MAX_STRIDE", 3, int)
+QUALITY_IMGSZ_STEPS = _env("QUALITY_IMGSZ_STEPS", (512, 416, 320), lambda v: tuple(int(s) for s in v.split(",")))
+QUALITY_CONF_STEPS = _env("QUALITY_CONF_STEPS", (0.25, 0.35, 0.45), lambda v: tuple(float(s) for s in v.split(",")))
@@ -0,0 +1,300 @@
+# detection_log.py
+
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import config
+from waste_mapping import class_ids
+
+# column name -> dtype; every chunk stores one .npy file per column
+CAPTURE_COLUMNS = {"ts": np.float64, "session": np.int64}
+BOX_COLUMNS = {"capture": np.int32, "cls": np.int16, "conf": np.float32, "xyxy": np.float32}
+PAYOUT_COLUMNS = {"ts": np.float64, "session": np.int64, "points": np.float64, "weight": np.float64}
+TABLES = {"captures": CAPTURE_COLUMNS, "boxes": BOX_COLUMNS, "payouts": PAYOUT_COLUMNS}
+
+
+def new_session_id():
+    return time.time_ns()
+
+
+class DetectionLog:
+    """Append-only columnar log of every capture's boxes and every session's payout.
+
+    Rows are buffered in memory and written as immutable chunk directories of .npy
+    columns (`captures_ts.npy`, `boxes_cls.npy`, ...). Readers memory-map the
+    columns, so reports touch only the columns they need and never load the log.
+    `boxes_capture` indexes the captures of the same chunk; class ids are resolved
+    through the chunk's `labels.json`, so chunks from different models can be mixed.
+
+    Rows are buffered across sessions until `chunk_rows` boxes or `flush_seconds`
+    have accumulated (and at exit), and small chunks are merged automatically once
+    there are more than `compact_after` of them. A merged chunk lists the chunks it
+    replaces in `replaces.json`; readers skip those, so a crash before they are
+    deleted never counts their rows twice.
+    """
+
+    def __init__(self, root=None, chunk_rows=None, flush_seconds=None, compact_after=None):
+        self.root = root or config.DETECTION_LOG_DIR
+        self.chunk_rows = chunk_rows or config.DETECTION_LOG_CHUNK_ROWS
+        self.flush_seconds = config.DETECTION_LOG_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.compact_after = config.DETECTION_LOG_COMPACT_AFTER if compact_after is None else compact_after
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._rows = {table: {col: [] for col in cols} for table, cols in TABLES.items()}
+        self._labels = {}
+        self._pending_boxes = 0
+        self._first_row = None
+
+    def _due(self):
+        """Called with the lock held after buffering a row: is it time to write a chunk?"""
+        if self._first_row is None:
+            self._first_row = time.monotonic()
+        return (self._pending_boxes >= self.chunk_rows or
+                time.monotonic() - self._first_row >= self.flush_seconds)
+
+    def record_capture(self, result, session, ts=None):
+        """Buffer the boxes of one YOLO result as a capture of `session`"""
+        boxes = result.boxes
+        cls = class_ids(result)
+        conf = boxes.conf.cpu().numpy()
+        xyxy = boxes.xyxy.cpu().numpy()
+        with self._lock:
+            captures = self._rows["captures"]
+            index = len(captures["ts"])
+            captures["ts"].append(time.time() if ts is None else ts)
+            captures["session"].append(session)
+
+            # remap model class ids onto this chunk's label table
+            size = int(cls.max()) + 1 if len(cls) else 0
+            remap = np.array([self._label_id(result.names.get(i, i)) for i in range(size)], dtype=np.int16)
+            rows = self._rows["boxes"]
+            rows["capture"].append(np.full(len(cls), index, dtype=np.int32))
+            rows["cls"].append(remap[cls] if len(cls) else np.empty(0, dtype=np.int16))
+            rows["conf"].append(conf.astype(np.float32))
+            rows["xyxy"].append(xyxy.astype(np.float32).reshape(-1, 4))
+            self._pending_boxes += len(cls)
+            due = self._due()
+        if due:
+            self.flush()
+
+    def record_payout(self, session, points, weight, ts=None):
+        with self._lock:
+            rows = self._rows["payouts"]
+            rows["ts"].append(time.time() if ts is None else ts)
+            rows["session"].append(session)
+            rows["points"].append(points)
+            rows["weight"].append(weight)
+            due = self._due()
+        if due:
+            self.flush()
+
+    def _label_id(self, label):
+        return self._labels.setdefault(str(label).lower(), len(self._labels))
+
+    def flush(self):
+        """Write buffered rows as a new chunk (no-op when nothing is buffered), then compact if due"""
+        with self._flush_lock:
+            name = self._flush()
+            if name and len(self.chunks()) > self.compact_after:
+                self.compact()
+            return name
+
+    def _flush(self):
+        with self._lock:
+            rows, labels = self._rows, self._labels
+            if not rows["captures"]["ts"] and not rows["payouts"]["ts"]:
+                return None
+            self._reset()
+        columns = {}
+        for table, cols in TABLES.items():
+            for col, dtype in cols.items():
+                values = rows[table][col]
+                if table == "boxes":
+                    empty = np.empty((0, 4) if col == "xyxy" else 0, dtype=dtype)
+                    columns[f"{table}_{col}"] = np.concatenate(values).astype(dtype) if values else empty
+                else:
+                    columns[f"{table}_{col}"] = np.asarray(values, dtype=dtype)
+        return self._write_chunk(columns, sorted(labels, key=labels.get))
+
+    def _write_chunk(self, columns, labels, replaces=()):
+        os.makedirs(self.root, exist_ok=True)
+        name = f"chunk-{time.time_ns():020d}-{os.getpid()}"
+        tmp = os.path.join(self.root, f".{name}.tmp")
+        os.makedirs(tmp)
+        for key, values in columns.items():
+            np.save(os.path.join(tmp, f"{key}.npy"), values)
+        with open(os.path.join(tmp, "labels.json"), "w", encoding="utf-8") as f:
+            json.dump(labels, f)
+        if replaces:
+            with open(os.path.join(tmp, "replaces.json"), "w", encoding="utf-8") as f:
+                json.dump([os.path.basename(path) for path in replaces], f)
+        # 🔹 Chunks appear atomically: readers never see a half-written directory, and a
+        # merged chunk hides the chunks it replaces in the same step
+        os.replace(tmp, os.path.join(self.root, name))
+        return name
+
+    def _scan(self):
+        """(live chunk paths, paths of chunks superseded by a merged chunk but not yet deleted)"""
+        if not os.path.isdir(self.root):
+            return [], []
+        names = sorted(e.name for e in os.scandir(self.root) if e.is_dir() and e.name.startswith("chunk-"))
+        superseded = set()
+        for name in names:
+            replaces = os.path.join(self.root, name, "replaces.json")
+            if os.path.exists(replaces):
+                with open(replaces, encoding="utf-8") as f:
+                    superseded.update(json.load(f))
+        return ([os.path.join(self.root, n) for n in names if n not in superseded],
+                [os.path.join(self.root, n) for n in names if n in superseded])
+
+    def chunks(self):
+        return self._scan()[0]
+
+    def compact(self, max_rows=None):
+        """Merge runs of small chunks (typical for a kiosk) into larger ones; returns chunks merged"""
+        max_rows = max_rows or self.chunk_rows
+        live, superseded = self._scan()
+        # leftovers of a merge interrupted after its chunk was written
+        for path in superseded:
+            shutil.rmtree(path, ignore_errors=True)
+        for entry in os.scandir(self.root) if os.path.isdir(self.root) else ():
+            if entry.name.endswith(".tmp") and time.time() - entry.stat().st_mtime > 3600:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+        sizes = {path: len(_column(path, "boxes_cls")) for path in live}
+        small = [path for path in live if sizes[path] < max_rows]
+        merged = 0
+        while len(small) > 1:
+            group, rows = [], 0
+            while small and (not group or rows + sizes[small[0]] <= max_rows):
+                rows += sizes[small[0]]
+                group.append(small.pop(0))
+            if len(group) > 1:
+                columns, labels = _merge(group)
+                self._write_chunk(columns, labels, replaces=group)
+                for path in group:
+                    shutil.rmtree(path, ignore_errors=True)
+                merged += len(group)
+        return merged
+
+
+def _column(chunk, key):
+    return np.load(os.path.join(chunk, f"{key}.npy"), mmap_mode="r")
+
+
+def _labels(chunk):
+    with open(os.path.join(chunk, "labels.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _merge(chunks):
+    labels = {}
+    parts = {f"{t}_{c}": [] for t, cols in TABLES.items() for c in cols}
+    offset = 0
+    for chunk in chunks:
+        remap = np.array([labels.setdefault(label, len(labels)) for label in _labels(chunk)], dtype=np.int16)
+        for key in parts:
+            values = np.asarray(_column(chunk, key))
+            if key == "boxes_cls" and len(values):
+                values = remap[values]
+            elif key == "boxes_capture":
+                values = values + offset
+            parts[key].append(values)
+        offset += len(_column(chunk, "captures_ts"))
+    columns = {key: np.concatenate(values) for key, values in parts.items()}
+    return columns, sorted(labels, key=labels.get)
+
+
+def _day_index(ts, utc_offset):
+    return ((ts + utc_offset) // 86400).astype(np.int64)
+
+
+def report(root=None, since=None, bins=10):
+    """Class frequency, confidence histogram and per-day totals over the whole log.
+
+    Works chunk by chunk on memory-mapped columns; `since` (YYYY-MM-DD) skips
+    older captures and payouts.
+    """
+    log = DetectionLog(root)
+    utc_offset = datetime.now().astimezone().utcoffset().total_seconds()
+    since_ts = datetime.strptime(since, "%Y-%m-%d").timestamp() if since else -np.inf
+
+    class_counts = {}
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    conf_hist = np.zeros(bins, dtype=np.int64)
+    days = {}
+
+    def day(d):
+        return days.setdefault(int(d), {"captures": 0, "boxes": 0, "points": 0.0, "weight": 0.0})
+
+    for chunk in log.chunks():
+        labels = _labels(chunk)
+        cap_ts = _column(chunk, "captures_ts")
+        keep_capture = cap_ts >= since_ts
+        box_capture = _column(chunk, "boxes_capture")
+        keep = keep_capture[box_capture] if len(box_capture) else np.zeros(0, dtype=bool)
+
+        cls = _column(chunk, "boxes_cls")[keep]
+        counts = np.bincount(cls, minlength=len(labels))
+        for i in np.flatnonzero(counts):
+            class_counts[labels[i]] = class_counts.get(labels[i], 0) + int(counts[i])
+        conf_hist += np.histogram(_column(chunk, "boxes_conf")[keep], bins=edges)[0]
+
+        cap_day = _day_index(np.asarray(cap_ts), utc_offset)
+        for d, n in zip(*np.unique(cap_day[keep_capture], return_counts=True)):
+            day(d)["captures"] += int(n)
+        for d, n in zip(*np.unique(cap_day[box_capture[keep]], return_counts=True)):
+            day(d)["boxes"] += int(n)
+
+        pay_ts = _column(chunk, "payouts_ts")
+        pay_keep = pay_ts >= since_ts
+        pay_day = _day_index(np.asarray(pay_ts)[pay_keep], utc_offset)
+        if len(pay_day):
+            unique, inverse = np.unique(pay_day, return_inverse=True)
+            points = np.bincount(inverse, weights=_column(chunk, "payouts_points")[pay_keep])
+            weight = np.bincount(inverse, weights=_column(chunk, "payouts_weight")[pay_keep])
+            for d, p, w in zip(unique, points, weight):
+                day(d)["points"] += float(p)
+                day(d)["weight"] += float(w)
+
+    return {
+        "chunks": len(log.chunks()),
+        "boxes": int(sum(class_counts.values())),
+        "class_frequency": dict(sorted(class_counts.items(), key=lambda kv: -kv[1])),
+        "confidence_histogram": {f"{lo:.1f}-{hi:.1f}": int(n) for lo, hi, n in zip(edges, edges[1:], conf_hist)},
+        "per_day": {datetime.fromtimestamp(d * 86400, timezone.utc).strftime("%Y-%m-%d"): v for d, v in sorted(days.items())},
+    }
+
+
+detection_log = DetectionLog()
+atexit.register(detection_log.flush)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reports over the columnar detection log")
+    parser.add_argument("command", choices=["report", "compact"])
+    parser.add_argument("--root", default=None)
+    parser.add_argument("--since", default=None, help="only rows on or after YYYY-MM-DD")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "compact":
+        merged = DetectionLog(args.root).compact()
+        print(f"🗜️ Merged {merged} chunks in {time.perf_counter() - start:.2f}s")
+    else:
+        summary = report(args.root, since=args.since)
+        print(json.dumps(summary, indent=2))
+        print(f"📊 {summary['boxes']} detections in {summary['chunks']} chunks, "
+              f"{time.perf_counter() - start:.2f}s")
@@ -1,23 +1,119 @@
 # detection_module.py
 
-from ultralytics import YOLO
-from waste_mapping import check_recyclability
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-model = YOLO("yolov8n.pt")
+import cv2
 
-def detect_items(image_path):
-    results = model(image_path, verbose=False)
+import config
+from frame_cache import content_digest, detection_memo
+from model_registry import get_model, model_path
+from waste_mapping import summarize_detections, summarize_labels
 
-    all_items = []
-    recyclable_items = {}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
 
-    for box in results[0].boxes:
-        cls = int(box.cls[0])
-        label = results[0].names[cls].lower()
-        all_items.append(label)
 
-        status = check_recyclability(label)
-        if status == "Recyclable":
-            recyclable_items[label] = recyclable_items.get(label, 0) + 1
+def memo_key(path):
+    """Detection memo key: the file's bytes plus everything that changes what the model sees"""
+    return f"{content_digest(path)}:{config.MODEL_BACKEND}:{model_path()}:{config.INFERENCE_IMGSZ}"
 
+
+def detect_items(image):
+    # image can be a file path or an in-memory BGR frame; files already scored come from the memo
+    key = memo_key(image) if isinstance(image, (str, os.PathLike)) else None
+    labels = detection_memo.get(key) if key else None
+    if labels is not None:
+        return summarize_labels(labels)
+    results = get_model()(image, imgsz=config.INFERENCE_IMGSZ, verbose=False)
+    all_items, recyclable_items = summarize_detections(results[0])
+    if key:
+        detection_memo.put(key, all_items)
     return all_items, recyclable_items
+
+
+def iter_image_paths(source):
+    """Yield image paths from a directory (recursively, in sorted order) or from an iterable of paths"""
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames[:] = sorted(d for d in dirnames if d != "thumbs")
+            for name in sorted(filenames):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(dirpath, name)
+    else:
+        yield from source
+
+
+def _load(path):
+    """Decode worker: (memo key, memoized labels or None, frame or None)"""
+    key = memo_key(path)
+    labels = detection_memo.get(key)
+    return key, labels, None if labels is not None else cv2.imread(path)
+
+
+def detect_items_batch(source, batch_size=8, decode_workers=2, prefetch_batches=2):
+    """Stream detections for many images: yields (path, all_items, recyclable_items) per image.
+
+    `source` is a directory or an iterable of paths. Images are decoded by a small
+    thread pool that stays at most `prefetch_batches` batches ahead of the model,
+    and the model is called on `batch_size` frames at a time, so memory stays
+    flat no matter how large the archive is. Images whose bytes were scored before
+    are answered from the detection memo without being decoded.
+    """
+    model = get_model()
+    paths = iter_image_paths(source)
+    window = batch_size * max(1, prefetch_batches)
+
+    with ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="ecospy-decode") as pool:
+        pending = deque()
+
+        def fill():
+            while len(pending) < window:
+                path = next(paths, None)
+                if path is None:
+                    return
+                pending.append((path, pool.submit(_load, path)))
+
+        fill()
+        while pending:
+            batch, batch_frames = [], []
+            while pending and len(batch_frames) < batch_size:
+                path, future = pending.popleft()
+                key, labels, frame = future.result()
+                if labels is None and frame is None:
+                    print(f"⚠️ Skipping unreadable image {path}")
+                    continue
+                batch.append((path, key, labels))
+                if labels is None:
+                    batch_frames.append(frame)
+            fill()
+
+            results = iter(model(batch_frames, imgsz=config.INFERENCE_IMGSZ, verbose=False) if batch_frames else ())
+            for path, key, labels in batch:
+                if labels is None:
+                    all_items, recyclable_items = summarize_detections(next(results))
+                    detection_memo.put(key, all_items)
+                else:
+                    all_items, recyclable_items = summarize_labels(labels)
+                yield path, all_items, recyclable_items
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-score a folder of captured images")
+    parser.add_argument("source", nargs="?", default="waste_collected")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--decode-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    totals = {}
+    count = 0
+    for path, all_items, recyclable_items in detect_items_batch(
+            args.source, batch_size=args.batch_size, decode_workers=args.decode_workers):
+        count += 1
+        for k, v in recyclable_items.items():
+            totals[k] = totals.get(k, 0) + v
+        print(f"{path}: {recyclable_items or 'None'}")
+    print(f"\n♻️ Scored {count} images. Recyclable totals: {totals or 'None'}")
+    print(detection_memo.report())
@@ -0,0 +1,286 @@
+# fake_firestore.py
+# In-memory stand-in for the subset of the Firestore client EcoSpy uses, so the
+# pipeline can run (and be benchmarked) without credentials or network.
+# Select it with ECOSPY_FIRESTORE_BACKEND=memory.
+
+import copy
+import threading
+import uuid
+
+
+def _is_increment(value):
+    return type(value).__name__ == "Increment" and hasattr(value, "value")
+
+
+class _AggregationResult:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+
+class _Aggregation:
+    def __init__(self, query):
+        self.query = query
+        self._specs = []
+
+    def count(self, alias=None):
+        self._specs.append(("count", None, alias or "count"))
+        return self
+
+    def sum(self, field, alias=None):
+        self._specs.append(("sum", field, alias or "sum"))
+        return self
+
+    def get(self, transaction=None):
+        docs = self.query._matching()
+        # billed like Firestore: one read per batch of up to 1000 index entries
+        self.query._db.reads += 1 + len(docs) // 1000
+        return [[_AggregationResult(alias, len(docs) if kind == "count" else
+                                    sum(data.get(field, 0) for _, data in docs))
+                 for kind, field, alias in self._specs]]
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        return FakeCollectionReference(self._db, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name):
+        return FakeCollectionReference(self._db, f"{self.path}/{name}")
+
+    def get(self, transaction=None):
+        return self._db._read(self)
+
+    def set(self, data, merge=False):
+        self._db._write([("set", self, data, merge)])
+
+    def update(self, data):
+        self._db._write([("update", self, data, False)])
+
+    def delete(self):
+        self._db._write([("delete", self, None, False)])
+
+
+class FakeQuery:
+    def __init__(self, db, path, filters=(), order=None, limit=None, after=None, group=False):
+        self._db = db
+        self._path = path
+        self._filters = tuple(filters)
+        self._order = order
+        self._limit = limit
+        self._after = after
+        self._group = group
+
+    def _copy(self, **changes):
+        args = dict(filters=self._filters, order=self._order, limit=self._limit,
+                    after=self._after, group=self._group)
+        args.update(changes)
+        return FakeQuery(self._db, self._path, **args)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(order=(field, direction))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot)
+
+    def count(self, alias=None):
+        return _Aggregation(self).count(alias)
+
+    def sum(self, field, alias=None):
+        return _Aggregation(self).sum(field, alias)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+    def stream(self, transaction=None):
+        docs = self._matching()
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        self._db.reads += max(len(docs), 1)
+        return iter([FakeSnapshot(FakeDocumentReference(self._db, path), data) for path, data in docs])
+
+    def _key(self, path, data):
+        field = self._order[0] if self._order else "__name__"
+        return path if field == "__name__" else (data.get(field), path)
+
+    def _matching(self):
+        with self._db._lock:
+            docs = [(path, copy.deepcopy(data)) for path, data in self._db._docs.items() if self._contains(path)]
+        docs = [(path, data) for path, data in docs if all(_match(data, f) for f in self._filters)]
+        reverse = bool(self._order) and self._order[1] in ("DESCENDING", "desc")
+        docs.sort(key=lambda d: self._key(*d), reverse=reverse)
+        if self._after is not None:
+            mark = self._key(self._after.reference.path, self._after._data or {})
+            docs = [d for d in docs if (self._key(*d) < mark if reverse else self._key(*d) > mark)]
+        return docs
+
+    def _contains(self, path):
+        parent, _ = path.rsplit("/", 1)
+        if self._group:
+            return parent.rsplit("/", 1)[-1] == self._path
+        return parent == self._path
+
+
+def _match(data, condition):
+    field, op, value = condition
+    if field not in data:
+        return False
+    actual = data[field]
+    if op == "==":
+        return actual == value
+    if op == "in":
+        return actual in value
+    if op == "array_contains":
+        return value in actual
+    return {"<": actual < value, "<=": actual <= value, ">": actual > value, ">=": actual >= value}[op]
+
+
+class _Watch:
+    def __init__(self, db, path, callback):
+        self._db = db
+        self.path = path
+        self.callback = callback
+
+    def unsubscribe(self):
+        with self._db._lock:
+            if self in self._db._watches:
+                self._db._watches.remove(self)
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db, path):
+        super().__init__(db, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self._db, f"{self._path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+    def list_documents(self):
+        with self._db._lock:
+            paths = [path for path in self._db._docs if self._contains(path)]
+        return [FakeDocumentReference(self._db, path) for path in sorted(paths)]
+
+    def on_snapshot(self, callback):
+        watch = _Watch(self._db, self._path, callback)
+        with self._db._lock:
+            self._db._watches.append(watch)
+        callback(self.get(), [], None)
+        return watch
+
+
+class FakeTransaction:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        self._writes.append(("update", ref, data, False))
+
+    def delete(self, ref):
+        self._writes.append(("delete", ref, None, False))
+
+
+class FakeFirestore:
+    """Thread-safe, in-memory Firestore: collections, queries, transactions, count/sum and snapshot listeners"""
+
+    def __init__(self):
+        self._docs = {}
+        self._lock = threading.RLock()
+        self._watches = []
+        self.reads = 0
+        self.writes = 0
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def collection_group(self, collection_id):
+        return FakeQuery(self, collection_id, group=True)
+
+    def document(self, path):
+        return FakeDocumentReference(self, path)
+
+    def get_all(self, refs):
+        return [self._read(ref) for ref in refs]
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def run_transaction(self, fn, *args):
+        """Run `fn(transaction, *args)` atomically (see firebase_module.run_transaction)"""
+        with self._lock:
+            transaction = FakeTransaction(self)
+            result = fn(transaction, *args)
+            self._write(transaction._writes)
+            return result
+
+    def _read(self, ref):
+        with self._lock:
+            self.reads += 1
+            data = self._docs.get(ref.path)
+            return FakeSnapshot(ref, copy.deepcopy(data) if data is not None else None)
+
+    def _write(self, writes):
+        with self._lock:
+            # all or nothing, like a Firestore commit: apply to a staged copy of the touched docs
+            staged = {}
+            for kind, ref, data, merge in writes:
+                if kind == "delete":
+                    staged[ref.path] = None
+                    continue
+                exists = staged[ref.path] is not None if ref.path in staged else ref.path in self._docs
+                if kind == "update" and not exists:
+                    raise KeyError(f"No document to update: {ref.path}")
+                current = staged.get(ref.path, self._docs.get(ref.path)) if (kind == "update" or merge) else None
+                merged = dict(current or {})
+                for field, value in data.items():
+                    merged[field] = merged.get(field, 0) + value.value if _is_increment(value) else copy.deepcopy(value)
+                staged[ref.path] = merged
+            self.writes += len(writes)
+            for path, data in staged.items():
+                if data is None:
+                    self._docs.pop(path, None)
+                else:
+                    self._docs[path] = data
+            touched = {ref.path.rsplit("/", 1)[0] for _, ref, _, _ in writes}
+            watches = [w for w in self._watches if w.path in touched]
+        for watch in watches:
+            watch.callback(FakeCollectionReference(self, watch.path).get(), [], None)
+
+    def load(self, documents):
+        """Seed the store from a {path: data} dict"""
+        with self._lock:
+            for path, data in documents.items():
+                self._docs[path] = copy.deepcopy(data)
@@ -0,0 +1,93 @@
+# filename_allocator.py
+
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+COUNTER_FILE = ".counter"
+LOCK_FILE = ".counter.lock"
+_NUMBERED = re.compile(r"^(\d+)\.(jpg|webp)$")
+
+
+def allocate_filename(folder, ext="jpg"):
+    """Return a new unique capture path like `folder/2025-09-11/42.jpg`.
+
+    The number comes from a counter file updated under an exclusive file lock,
+    so it costs O(1) regardless of how many captures exist and two processes
+    capturing at once never get the same number.
+    """
+    os.makedirs(folder, exist_ok=True)
+    with _locked(folder):
+        counter_path = os.path.join(folder, COUNTER_FILE)
+        if os.path.exists(counter_path):
+            with open(counter_path) as f:
+                last = int(f.read().strip() or 0)
+        else:
+            last = migrate_existing(folder)
+        _write_counter(counter_path, last + 1)
+
+    shard = os.path.join(folder, datetime.now().strftime("%Y-%m-%d"))
+    os.makedirs(shard, exist_ok=True)
+    return os.path.join(shard, f"{last + 1}.{ext}")
+
+
+def migrate_existing(folder):
+    """One-time migration: move flat `N.jpg` files into date shards and return the highest N.
+
+    Only runs when the counter file is missing, i.e. on the first capture after upgrading.
+    """
+    highest = 0
+    moved = 0
+    for entry in os.scandir(folder):
+        if entry.is_dir():
+            # existing shards (counter file lost): just account for their numbers
+            for f in os.scandir(entry.path):
+                m = _NUMBERED.match(f.name)
+                if m:
+                    highest = max(highest, int(m.group(1)))
+            continue
+        m = _NUMBERED.match(entry.name)
+        if not m:
+            continue
+        highest = max(highest, int(m.group(1)))
+        day = datetime.fromtimestamp(entry.stat().st_mtime).strftime("%Y-%m-%d")
+        os.makedirs(os.path.join(folder, day), exist_ok=True)
+        os.replace(entry.path, os.path.join(folder, day, entry.name))
+        moved += 1
+    if moved:
+        print(f"📁 Migrated {moved} captures in {folder} into dated folders")
+    return highest
+
+
+def _write_counter(counter_path, value):
+    tmp_path = f"{counter_path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(value))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, counter_path)
+
+
+@contextmanager
+def _locked(folder):
+    with open(os.path.join(folder, LOCK_FILE), "a+") as lock:
+        if fcntl:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        else:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
@@ -3,9 +3,22 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+import config
+
 def init_firebase():
-    cred = credentials.Certificate("serviceAccountKey.json")
+    if config.FIRESTORE_BACKEND == "memory":
+        from fake_firestore import FakeFirestore
+        print("🧪 Using in-memory Firestore")
+        return FakeFirestore()
+    cred = credentials.Certificate(config.FIREBASE_CREDENTIALS)
     firebase_admin.initialize_app(cred)
     db = firestore.client()
     print("✅ Firebase setup complete!")
     return db
+
+
+def run_transaction(db, fn, *args):
+    """Run `fn(transaction, *args)` in a transaction, retried on contention"""
+    if hasattr(db, "run_transaction"):  # in-memory stand-in
+        return db.run_transaction(fn, *args)
+    return firestore.transactional(fn)(db.transaction(), *args)
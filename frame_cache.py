@@ -0,0 +1,165 @@
+# frame_cache.py
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import config
+
+
+def dhash(frame, size=8):
+    """64-bit difference hash of a BGR frame: robust to noise, exposure and JPEG re-encoding"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def content_digest(data):
+    """Exact content key for a frame (its pixels) or an image file (its bytes)"""
+    if isinstance(data, np.ndarray):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(str(data.shape).encode())
+        h.update(np.ascontiguousarray(data).data)
+        return h.hexdigest()
+    h = hashlib.blake2b(digest_size=16)
+    with open(data, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class NearDuplicateIndex:
+    """Set of 64-bit perceptual hashes answering "is there one within `max_distance` bits?" in O(1).
+
+    Each hash is split into `max_distance + 1` bands and indexed by every band. Two
+    hashes that differ in at most `max_distance` bits must agree on at least one
+    whole band (pigeonhole), so a lookup only compares against the few hashes that
+    share a band instead of scanning the whole session.
+    """
+
+    MAX_DISTANCE = 15  # beyond this, bands get too narrow to narrow anything down
+
+    def __init__(self, max_distance=None):
+        self.max_distance = config.DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+        if not 0 <= self.max_distance <= self.MAX_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {self.MAX_DISTANCE} bits, got {self.max_distance}")
+        # more bands than tolerated differing bits keeps the pigeonhole guarantee
+        self.bands = self.max_distance + 1
+        self.width = 64 // self.bands
+        self._buckets = {}
+        self._payloads = {}
+
+    def _keys(self, value):
+        mask = (1 << self.width) - 1
+        return [(i, (value >> (i * self.width)) & mask) for i in range(self.bands)]
+
+    def find(self, value, accept=None):
+        """Return (hash, payload) of a stored hash within max_distance of `value`, or None.
+
+        With `accept`, only entries whose payload passes `accept(payload)` count as a match.
+        """
+        for key in self._keys(value):
+            for other in self._buckets.get(key, ()):
+                if bin(value ^ other).count("1") <= self.max_distance and \
+                        (accept is None or accept(self._payloads[other])):
+                    return other, self._payloads[other]
+        return None
+
+    def add(self, value, payload=None):
+        self._payloads[value] = payload
+        for key in self._keys(value):
+            self._buckets.setdefault(key, set()).add(value)
+
+    def clear(self):
+        self._buckets.clear()
+        self._payloads.clear()
+
+    def __len__(self):
+        return len(self._payloads)
+
+
+class DetectionMemo:
+    """LRU of the raw detected labels of an image, keyed by its content and the model settings.
+
+    Only labels are stored: recyclability is recomputed on every hit, so re-scoring
+    after a RECYCLABLE_ITEMS change uses the new rules. Entries are appended to a
+    JSON-lines file as they are computed, so re-scoring an archive a second time only
+    runs the model on images (or model settings) it has not seen before. Once the
+    file holds more than twice `maxsize` lines (and at least 2000), mostly superseded
+    or evicted keys, it is rewritten with just the live entries.
+    """
+
+    def __init__(self, path=None, maxsize=None):
+        self.path = config.DETECTION_MEMO_PATH if path is None else path
+        self.maxsize = config.DETECTION_MEMO_SIZE if maxsize is None else maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._lines = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                self._lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                if "labels" in entry:  # older entries stored final results; they are re-scored
+                    self._remember(entry["key"], entry["labels"])
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, labels):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._remember(key, list(labels))
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "labels": list(labels)}) + "\n")
+                self._lines += 1
+                if self._lines > 2 * max(self.maxsize, 1000):
+                    self._compact()
+
+    def _compact(self):
+        """Rewrite the file with only the entries in memory, least recently used first"""
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for key, labels in self._entries.items():
+                f.write(json.dumps({"key": key, "labels": labels}) + "\n")
+        os.replace(tmp, self.path)
+        self._lines = len(self._entries)
+
+    def report(self):
+        total = self.hits + self.misses
+        return f"🧠 Detection memo: {self.hits}/{total} hits, {len(self._entries)} entries"
+
+
+detection_memo = DetectionMemo()
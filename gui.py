@@ -1,16 +1,41 @@
+import atexit
+import threading
 import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk
 import cv2
-from main import detect_recyclables, model, update_firebase, db, calculate_payout, get_next_filename
+from main import commit_payouts, db, calculate_payout, get_next_filename
+from payout_journal import PayoutJournal
+from async_bridge import run_async
+import metrics
+from model_registry import get_model, honours_imgsz
+from inference_server import RemoteModel
+from waste_mapping import summarize_detections, get_class_lookup, class_ids
+from archive_writer import archive_writer
+from user_lookup import get_user_resolver
+from inference_worker import LiveDetector
+from overlay import project_boxes, FramePresenter
+from functools import partial
+from asset_cache import AssetCache, timed_transition
+from motion_gate import MotionGate
+from frame_cache import NearDuplicateIndex, dhash
+from detection_log import detection_log, new_session_id
+from quality_controller import QualityController, quality_levels
+import config
 
 
 ALLOWED_CLASSES = {"bottle", "cup", "can","person","cellphone"} 
 
 
 
-cap = None
+live_detector = None
+# ultralytics predictors are not thread-safe, and a stopped preview worker may still be
+# inside model() when the next one starts: every call to `model` holds this lock
+model_lock = threading.Lock()
+presenter = None
+last_frame_seq = 0
 frame_label = None
+metrics_label = None
 camera_running = False
 detected_items = []
 recyclable_items = {}
@@ -19,6 +44,8 @@ current_user_ref = None
 current_user_data = None
 status_label = None
 thumb_label = None
+session_captures = NearDuplicateIndex()
+session_id = new_session_id()
 
 
 
@@ -31,10 +58,12 @@ def clear_screen():
     thumb_label = None
 
 def reset_session():
-    global detected_items, recyclable_items, filename, thumb_label, status_label
+    global detected_items, recyclable_items, filename, thumb_label, status_label, session_id
     detected_items = []
     recyclable_items = {}
     filename = None
+    session_captures.clear()
+    session_id = new_session_id()
     if thumb_label:
         thumb_label.destroy()
         thumb_label = None
@@ -47,6 +76,12 @@ def on_enter(e):
 def on_leave(e):
     e.widget['background'] = 'darkgreen'
 
+def set_busy(button, text):
+    """Disable `button` and show `text` while a background call runs; pass "" to restore"""
+    button.config(state="disabled" if text else "normal")
+    if status_label:
+        status_label.config(text=text)
+
 
 
 import time 
@@ -54,83 +89,127 @@ import time
 camera_start_time = None  
 
 def open_camera():
-    global cap, camera_running, frame_label, camera_start_time
+    global live_detector, presenter, camera_running, frame_label, camera_start_time, last_frame_seq, metrics_label
     clear_screen()
     frame_label = tk.Label(root)
     frame_label.place(x=0, y=0, relwidth=1, relheight=1)
-
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
+    metrics_label = None
+    if metrics.enabled and config.METRICS_OVERLAY:
+        metrics_label = tk.Label(root, text="", font=("Courier", 12), bg="black", fg="#3aec72")
+        metrics_label.place(x=10, y=10)
+
+    gate = MotionGate() if config.MOTION_GATE_ENABLED else None
+    presenter = FramePresenter(screen_width, screen_height)
+    live_detector = LiveDetector(infer=infer_frame, render=partial(render_frame, presenter),
+                                 source=config.CAMERA_SOURCE, gate=gate, controller=quality)
+    if not live_detector.start():
+        live_detector = None
         messagebox.showerror("Error", "Cannot open camera")
         return
 
     camera_running = True
+    last_frame_seq = 0
     camera_start_time = time.time()  
     show_camera_frame()
 
 
-def show_camera_frame():
-    global cap, frame_label, camera_running, camera_start_time
-    if not camera_running:
-        return
+def infer_frame(frame):
+    # runs on the inference worker thread, on the native camera frame; at level 0 it
+    # uses the same settings as a capture, so the capture can reuse these results
+    with model_lock:
+        if quality and quality.level:
+            return model(frame, imgsz=quality.imgsz, conf=quality.conf, verbose=False)
+        return model(frame, imgsz=config.INFERENCE_IMGSZ, verbose=False)
 
-    ret, frame = cap.read()
-    if ret:
-        frame_full = cv2.resize(frame, (screen_width, screen_height))
-        results = model(frame_full, verbose=False)
 
-        
+def render_frame(presenter, frame, results):
+    # runs on the inference worker thread; draws into the presenter's reusable buffers.
+    # `results` may come from an earlier frame when the motion gate skipped inference.
+    result = results[0]
+    cls = class_ids(result)
+    keep = get_class_lookup(result.names).allowed_mask(ALLOWED_CLASSES)[cls]
 
-        allowed_mask = [i for i, cls_id in enumerate(results[0].boxes.cls)
-                        if results[0].names[int(cls_id)] in ALLOWED_CLASSES]
+    if not keep.any():
+        return presenter.render(frame)
+
+    # 🔹 boxes are in camera coordinates; project them onto the screen-sized frame
+    xyxy = project_boxes(result.boxes.xyxy.cpu().numpy()[keep], result.orig_shape, presenter.shape)
+    return presenter.render(frame, xyxy, cls[keep], result.boxes.conf.cpu().numpy()[keep], result.names)
 
-        if allowed_mask:
-            filtered_boxes = results[0].boxes[allowed_mask]
-            temp = results[0].new()
-            temp.boxes = filtered_boxes
-            annotated = temp.plot()
-        else:
-            annotated = frame_full
 
-        rgb_frame = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(rgb_frame)
-        imgtk = ImageTk.PhotoImage(img)
+def show_camera_frame():
+    global frame_label, camera_running, camera_start_time, last_frame_seq
+    if not camera_running:
+        return
 
-        frame_label.configure(image=imgtk)
-        frame_label.imgtk = imgtk
+    # 🔹 Only blit the newest annotated frame; capture and inference run on their own threads
+    output = live_detector.latest_output(after_seq=last_frame_seq)
+    if output:
+        last_frame_seq, _ = output
+        presenter.present(frame_label)
+        metrics.tick("display")
+        if metrics_label and last_frame_seq % 10 == 0:
+            metrics_label.config(text=metrics.overlay_text())
 
 
 
-    if time.time() - camera_start_time > 30:
+    if time.time() - camera_start_time > 30 or live_detector.ended.is_set():
+        error = live_detector.error
         close_camera()
         show_home()  
+        if error:
+            messagebox.showerror("Error", f"Detection stopped: {error}")
         return
 
 
-    frame_label.after(20, show_camera_frame)
+    # 🔹 Poll at the controller's pace instead of a fixed 20 ms
+    frame_label.after(quality.frame_interval_ms if quality else 20, show_camera_frame)
 
 
 
 def capture_image(event=None):
-    global cap, filename, detected_items, recyclable_items, thumb_label
-    if not cap:
-        return
-    ret, frame = cap.read()
-    if not ret:
-        messagebox.showerror("Error", "Failed to capture image")
-        return
+    with metrics.span("capture_image"):
+        _capture_image()
 
-    filename = get_next_filename()
-    cv2.imwrite(filename, frame)
 
-    
+def _capture_image():
+    global filename, detected_items, recyclable_items, thumb_label
+    if not live_detector:
+        return
+    # 🔹 Reuse the live worker's detections when they are fresh, otherwise run the
+    # model once on the in-memory frame; the JPEG is written in the background
+    detection = live_detector.latest_detection(config.CAPTURE_REUSE_MAX_AGE)
+    if detection:
+        frame, results = detection
+    else:
+        frame, results = live_detector.latest_frame(), None
+        if frame is None:
+            messagebox.showerror("Error", "Failed to capture image")
+            return
 
-    all_items, recyclable = detect_recyclables(model, filename)
-    all_items = [i for i in all_items if i in ALLOWED_CLASSES]
-    recyclable = {k: v for k, v in recyclable.items() if k in ALLOWED_CLASSES}
+    if results is None:
+        # the preview worker shares `model`: stop it so it doesn't queue up behind this call
+        live_detector.stop(timeout=None)
+        with model_lock:
+            results = model(frame, imgsz=config.INFERENCE_IMGSZ, verbose=False)
+    all_items, recyclable = summarize_detections(results[0], allowed=ALLOWED_CLASSES)
+
+    # 🔹 A capture that looks like an earlier one of this session *and* has the same item
+    # counts is probably the same items presented again: let the user decide
+    fingerprint = dhash(frame)
+    if config.DEDUP_ENABLED and recyclable:
+        match = session_captures.find(fingerprint, lambda previous: previous[1] == recyclable)
+        if match and not messagebox.askyesno(
+                "Already Added?", "These look like the items you already added.\nAdd them again?"):
+            print(f"♻️ Capture matches {match[1][0]}, not counted again")
+            close_camera()
+            show_results()
+            return
 
-    
-    
+    filename = get_next_filename()
+    archive_writer.submit(filename, frame)
+    session_captures.add(fingerprint, (filename, recyclable))
+    detection_log.record_capture(results[0], session_id)
 
     detected_items.extend(all_items)
     for k, v in recyclable.items():
@@ -149,25 +228,29 @@ def capture_image(event=None):
 
 
 def close_camera():
-    global cap, camera_running
+    global live_detector, camera_running
     camera_running = False
-    if cap:
-        cap.release()
-        cap = None
+    if live_detector:
+        live_detector.stop()
+        if live_detector.gate:
+            print(live_detector.gate.report())
+        if live_detector.controller:
+            print(live_detector.controller.report())
+        live_detector = None
 
 
 
 
+@timed_transition
 def show_home():
     reset_session()
     clear_screen()
-    try:
-        bg_img = Image.open("Ecospy_bg.jpg").resize((screen_width, screen_height))
-        bg_photo = ImageTk.PhotoImage(bg_img)
+    bg_photo = assets.photo("Ecospy_bg.jpg")
+    if bg_photo:
         bg_label = tk.Label(root, image=bg_photo)
         bg_label.image = bg_photo
         bg_label.place(x=0, y=0, relwidth=1, relheight=1)
-    except:
+    else:
         root.configure(bg="#66bb66")
 
     start_btn = tk.Button(root, text="Start", font=("Arial", 30), width=15, height=2,
@@ -176,13 +259,12 @@ def show_home():
     start_btn.bind("<Enter>", on_enter)
     start_btn.bind("<Leave>", on_leave)
 
+@timed_transition
 def show_results():
     clear_screen()
 
     
-    bg_image = Image.open("Ecospy.jpg")   
-    bg_image = bg_image.resize((root.winfo_screenwidth(), root.winfo_screenheight()))
-    bg_photo = ImageTk.PhotoImage(bg_image)
+    bg_photo = assets.photo("Ecospy.jpg")
 
     bg_label = tk.Label(root, image=bg_photo)
     bg_label.image = bg_photo
@@ -256,16 +338,14 @@ def show_results():
 
 
 
-import os
 
+@timed_transition
 def show_verification_screen():
     clear_screen()
 
     
-    if os.path.exists("eco.jpg"):
-        bg_img = Image.open("eco.jpg").resize((screen_width, screen_height))
-        bg_photo = ImageTk.PhotoImage(bg_img)
-
+    bg_photo = assets.photo("eco.jpg")
+    if bg_photo:
         global bg_label_verification
         bg_label_verification = tk.Label(root, image=bg_photo)
         bg_label_verification.image = bg_photo
@@ -289,28 +369,33 @@ def show_verification_screen():
     user_entry.pack(pady=25, padx=30)
 
     def submit_user():
-        global current_user_ref, current_user_data
         user_input = user_entry.get().strip()
         if not user_input:
             tk.messagebox.showerror("Error", "Please enter Email or Mobile")
             return
 
-        users_ref = db.collection("users")
-        query = users_ref.where("email", "==", user_input).limit(1).get()
-        if not query:
-            query = users_ref.where("phone", "==", user_input).limit(1).get()
-        if not query:
-            query = users_ref.where("mobile", "==", user_input).limit(1).get()
-
-        if query:
-            user_doc = query[0]
-            current_user_ref = user_doc.reference
-            current_user_data = {k: v for k, v in user_doc.to_dict().items()
-                                 if k in ["name","email","phone","mobile","ecopoints","wastecollected"]}
+        # 🔹 Query Firestore off the Tk thread; the button stays disabled until it answers
+        set_busy(submit_btn, "🔎 Looking up user...")
+        run_async(root, get_user_resolver(db).resolve, user_input,
+                  on_done=user_resolved, on_error=lookup_failed)
+
+    def user_resolved(found):
+        global current_user_ref, current_user_data
+        if not submit_btn.winfo_exists():  # user left this screen meanwhile
+            return
+        set_busy(submit_btn, "")
+        if found:
+            current_user_ref, current_user_data = found
             show_user_info()
         else:
             tk.messagebox.showerror("Error", "User not found. Try again.")
 
+    def lookup_failed(error):
+        if not submit_btn.winfo_exists():
+            return
+        set_busy(submit_btn, "")
+        tk.messagebox.showerror("Error", f"Could not reach the server: {error}")
+
     
     submit_btn = tk.Button(frame, text="Submit", font=("Arial", 22), width=20,
                            bg='darkgreen', fg='white', activebackground='#3aec72', command=submit_user)
@@ -329,14 +414,13 @@ def show_verification_screen():
 
 
 
+@timed_transition
 def show_user_info():
     clear_screen()
 
     
-    if os.path.exists("eco.jpg"):
-        bg_img = Image.open("eco.jpg").resize((screen_width, screen_height))
-        bg_photo = ImageTk.PhotoImage(bg_img)
-
+    bg_photo = assets.photo("eco.jpg")
+    if bg_photo:
         global bg_label_userinfo
         bg_label_userinfo = tk.Label(root, image=bg_photo)
         bg_label_userinfo.image = bg_photo
@@ -381,11 +465,29 @@ def show_user_info():
 
     
     def add_points():
-        total_payout, total_weight, waste_type_final = calculate_payout(db, recyclable_items)
-        update_firebase(current_user_ref, total_payout, total_weight, waste_type_final)
-        current_user_data["ecopoints"] += total_payout
+        # pricing is normally cached, but a cold cache means a Firestore read: keep it off the Tk thread
+        set_busy(add_btn, "💰 Calculating payout...")
+        run_async(root, calculate_payout, db, dict(recyclable_items),
+                  on_done=payout_ready, on_error=payout_failed)
+
+    def payout_ready(payout):
+        if not add_btn.winfo_exists():  # cancelled meanwhile: nothing was recorded
+            return
+        total_payout, total_weight, waste_type_final = payout
+        # 🔹 Journal locally and confirm right away; the flusher pushes it to Firestore
+        payout_journal.record(current_user_ref, total_payout, total_weight, waste_type_final)
+        detection_log.record_payout(session_id, total_payout, total_weight)
+        current_user_data["ecopoints"] = current_user_data.get("ecopoints", 0) + total_payout
+        # Firestore still has the old balance until the flusher confirms: a repeat lookup adds this
+        get_user_resolver(db).add_unconfirmed(current_user_ref, total_payout, total_weight)
         show_added_points(total_payout, waste_type_final)
 
+    def payout_failed(error):
+        if not add_btn.winfo_exists():
+            return
+        set_busy(add_btn, "")
+        tk.messagebox.showerror("Error", f"Could not load prices: {error}")
+
     add_btn = tk.Button(inner_frame, text="Add Points", font=("Arial", 22), width=20,
                         bg='darkgreen', fg='white', activebackground="#3aec72", command=add_points)
     add_btn.pack(pady=25)
@@ -401,14 +503,13 @@ def show_user_info():
 
 
 
+@timed_transition
 def show_added_points(total_payout, waste_type):
     clear_screen()
 
    
-    if os.path.exists("eco.jpg"):
-        bg_img = Image.open("eco.jpg").resize((screen_width, screen_height))
-        bg_photo = ImageTk.PhotoImage(bg_img)
-
+    bg_photo = assets.photo("eco.jpg")
+    if bg_photo:
         global bg_label_added
         bg_label_added = tk.Label(root, image=bg_photo)
         bg_label_added.image = bg_photo
@@ -453,12 +554,30 @@ def show_added_points(total_payout, waste_type):
 
 
 
+if config.INFERENCE_SERVER_ENABLED:
+    # 🔹 one model for the whole site: frames go to inference_server.py over shared memory
+    model = RemoteModel()
+    atexit.register(model.close)
+else:
+    model = get_model()
+# one controller for the whole run, so the level a kiosk settles on carries over between sessions
+quality = (QualityController(levels=quality_levels(scale_imgsz=honours_imgsz(model)))
+           if config.QUALITY_CONTROL_ENABLED else None)
+
 root = tk.Tk()
 root.attributes('-fullscreen', True)
 
 screen_width = root.winfo_screenwidth()
 screen_height = root.winfo_screenheight()
 
+assets = AssetCache((screen_width, screen_height))
+assets.preload()
+
+payout_journal = PayoutJournal(db, commit_payouts, on_committed=get_user_resolver(db).settle)
+payout_journal.start()
+
+metrics.start_exporter()
+
 root.bind("p", capture_image)
 root.bind("q", lambda e: root.destroy())
 
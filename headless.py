@@ -0,0 +1,357 @@
+# headless.py
+# Display-less detection pipeline for edge boxes and recorded footage (python main.py --headless ...).
+#
+#   capture -> decode -> inference -> filter/annotate -> sink
+#
+# Each stage runs on its own thread(s) and hands items on through a bounded queue,
+# so a slow stage applies back-pressure instead of buffering without limit.
+# Results are written as JSON lines, annotated frames as a video (camera/video
+# sources) or as images mirroring the input folder (image directories).
+
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import config
+import metrics
+from detection_module import iter_image_paths
+from model_registry import get_model, load_model
+from overlay import draw_detections
+from waste_mapping import class_ids, summarize_detections
+
+_DONE = object()
+
+
+class Stage:
+    """`workers` threads applying `fn(item)` to items from `inbox`; every non-None result goes to `outbox`.
+
+    When the input is exhausted the stage forwards a single end marker downstream
+    once all of its own workers have finished. An item `fn` fails on is logged,
+    counted in `errors` and handed to `on_error`.
+    """
+
+    def __init__(self, name, fn, inbox, outbox, workers=1, on_error=None):
+        self.name = name
+        self.fn = fn
+        self.on_error = on_error
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = max(1, workers)
+        self.busy_seconds = 0.0
+        self.items = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._run, name=f"ecospy-{self.name}-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+        threading.Thread(target=self._finish, name=f"ecospy-{self.name}-done", daemon=True).start()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                self.inbox.put(_DONE)  # let the other workers of this stage see it too
+                return
+            start = time.perf_counter()
+            try:
+                with metrics.span(self.name):
+                    result = self.fn(item)
+            except Exception as e:
+                # one bad item must not kill the worker: the stage would never pass on
+                # its end marker and the whole pipeline would hang
+                print(f"⚠️ {self.name} failed on an item: {e!r}")
+                result = None
+                with self._lock:
+                    self.errors += 1
+                if self.on_error:
+                    self.on_error(item)
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - start
+                self.items += 1
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+    def _finish(self):
+        for t in self._threads:
+            t.join()
+        if self.outbox is not None:
+            self.outbox.put(_DONE)
+
+
+def open_source(source):
+    """Return (kind, iterator, fps) for a camera index, video file/stream or image directory.
+
+    Image directories yield (name, encoded bytes) so decoding can run in parallel;
+    cameras and videos yield (index, frame) already decoded by VideoCapture.
+    """
+    if isinstance(source, str) and os.path.isdir(source):
+        def files():
+            for path in iter_image_paths(source):
+                with open(path, "rb") as f:
+                    yield os.path.relpath(path, source), f.read()
+        return "images", files(), None
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise SystemExit(f"❌ Could not open source {source!r}")
+    kind = "camera" if isinstance(source, int) else "video"
+
+    def frames():
+        index = 0
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                yield index, frame
+                index += 1
+        finally:
+            cap.release()
+    return kind, frames(), cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+
+class HeadlessPipeline:
+    def __init__(self, source, output=None, decode_workers=None, infer_workers=None, filter_workers=None,
+                 batch_size=None, queue_size=None, allowed=None, annotate=True, max_frames=None):
+        self.source = source
+        self.output = output
+        self.decode_workers = decode_workers or config.HEADLESS_DECODE_WORKERS
+        self.infer_workers = infer_workers or config.HEADLESS_INFER_WORKERS
+        self.filter_workers = filter_workers or config.HEADLESS_FILTER_WORKERS
+        self.batch_size = batch_size or config.HEADLESS_BATCH_SIZE
+        self.queue_size = queue_size or config.HEADLESS_QUEUE_SIZE
+        self.allowed = allowed
+        self.annotate = annotate and output is not None
+        self.max_frames = max_frames
+        self.captured = 0
+        self.dropped = 0
+        self.totals = {}
+        self._models = queue.Queue()
+        self._writer = None
+        self._stop = threading.Event()
+        self._skipped = set()  # seqs that will never reach the sink (dropped, unreadable, failed)
+        self._skipped_lock = threading.Lock()
+
+    def _skip(self, item):
+        """Tell the sink not to wait for the frame(s) of a decode/infer/filter item"""
+        seqs = [x[0] for x in item] if isinstance(item, list) else [item[0]]
+        with self._skipped_lock:
+            self._skipped.update(seqs)
+
+    # 🔹 stages -------------------------------------------------------------
+
+    def _decode(self, item):
+        seq, name, data = item
+        if isinstance(data, bytes):
+            data = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if data is None:
+                print(f"⚠️ Skipping unreadable image {name}")
+                self._skip(item)
+                return None
+        return seq, name, data
+
+    def _infer(self, batch):
+        # each inference worker checks out its own model instance
+        model = self._models.get()
+        try:
+            results = model([frame for _, _, frame in batch], imgsz=config.INFERENCE_IMGSZ, verbose=False)
+        finally:
+            self._models.put(model)
+        return [(seq, name, frame, result) for (seq, name, frame), result in zip(batch, results)]
+
+    def _filter(self, batch):
+        out = []
+        for seq, name, frame, result in batch:
+            all_items, recyclable = summarize_detections(result, allowed=self.allowed)
+            xyxy, cls, confs = result.boxes.xyxy.cpu().numpy(), class_ids(result), result.boxes.conf.cpu().numpy()
+            record = {
+                "seq": seq,
+                "source": name,
+                "items": all_items,
+                "recyclable": recyclable,
+                "boxes": [[*map(float, box), int(c), float(conf)] for box, c, conf in zip(xyxy, cls, confs)],
+            }
+            if self.annotate:
+                draw_detections(frame, xyxy, cls, confs, result.names)
+            out.append((seq, name, frame if self.annotate else None, record))
+        return out
+
+    # 🔹 driver -------------------------------------------------------------
+
+    def _capture(self, kind, items, decode_queue):
+        live = kind == "camera"
+        for seq, (name, data) in enumerate(items):
+            if self._stop.is_set() or (self.max_frames and seq >= self.max_frames):
+                break
+            self.captured += 1
+            if live:
+                # a camera can't wait: drop frames rather than fall behind real time
+                try:
+                    decode_queue.put_nowait((seq, name, data))
+                except queue.Full:
+                    self.dropped += 1
+                    self._skip((seq,))
+            else:
+                decode_queue.put((seq, name, data))
+        decode_queue.put(_DONE)
+
+    def _batcher(self, decoded, infer_queue):
+        """Group decoded frames into batches for the model (the last one may be short)"""
+        batch = []
+        while True:
+            item = decoded.get()
+            if item is _DONE:
+                break
+            batch.append(item)
+            if len(batch) >= self.batch_size or decoded.empty():
+                infer_queue.put(batch)
+                batch = []
+        if batch:
+            infer_queue.put(batch)
+        infer_queue.put(_DONE)
+
+    def run(self):
+        kind, items, fps = open_source(self.source)
+        print(f"🚀 Headless {kind} pipeline: {self.decode_workers} decode, {self.infer_workers} inference, "
+              f"{self.filter_workers} filter workers, batch {self.batch_size}")
+
+        self._models.put(get_model())
+        for _ in range(self.infer_workers - 1):
+            self._models.put(load_model())
+
+        if self.output:
+            os.makedirs(self.output, exist_ok=True)
+        size = self.queue_size
+        raw, decoded, batches, inferred, filtered = (queue.Queue(maxsize=size) for _ in range(5))
+        stages = [
+            Stage("decode", self._decode, raw, decoded, self.decode_workers, on_error=self._skip),
+            Stage("infer", self._infer, batches, inferred, self.infer_workers, on_error=self._skip),
+            Stage("filter", self._filter, inferred, filtered, self.filter_workers, on_error=self._skip),
+        ]
+        start = time.perf_counter()
+        for stage in stages:
+            stage.start()
+        threading.Thread(target=self._batcher, args=(decoded, batches), name="ecospy-batcher", daemon=True).start()
+        threading.Thread(target=self._capture, args=(kind, items, raw), name="ecospy-capture", daemon=True).start()
+
+        processed = self._sink(kind, filtered, fps)
+        elapsed = time.perf_counter() - start
+
+        summary = {
+            "source": str(self.source),
+            "frames": processed,
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "seconds": round(elapsed, 3),
+            "fps": round(processed / elapsed, 2) if elapsed else 0.0,
+            "stage_busy_seconds": {s.name: round(s.busy_seconds, 3) for s in stages},
+            "stage_errors": {s.name: s.errors for s in stages},
+            "recyclable_totals": self.totals,
+        }
+        if self.output:
+            with open(os.path.join(self.output, "summary.json"), "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+        return summary
+
+    def _sink(self, kind, filtered, fps):
+        """Write results strictly in input order; batches from parallel workers are re-sequenced
+        here, and a frame is only passed over once it is known to be skipped"""
+        results = open(os.path.join(self.output, "results.jsonl"), "w", encoding="utf-8") if self.output else None
+        waiting = {}
+        next_seq = 0
+        processed = 0
+        try:
+            while True:
+                try:
+                    batch = filtered.get()
+                except KeyboardInterrupt:
+                    # stop capturing, but let the frames already in flight reach the output
+                    print("⏹️ Stopping capture, draining the pipeline...")
+                    self._stop.set()
+                    continue
+                if batch is _DONE:
+                    break
+                for seq, name, frame, record in batch:
+                    waiting[seq] = (name, frame, record)
+                while True:
+                    if next_seq in waiting:
+                        self._emit(kind, *waiting.pop(next_seq), results, fps)
+                        processed += 1
+                    else:
+                        with self._skipped_lock:
+                            if next_seq not in self._skipped:
+                                break
+                            self._skipped.discard(next_seq)
+                    next_seq += 1
+            # everything has arrived: what is left sits behind frames that were skipped
+            for seq in sorted(waiting):
+                self._emit(kind, *waiting[seq], results, fps)
+                processed += 1
+        finally:
+            if results:
+                results.close()
+            if self._writer:
+                self._writer.release()
+        return processed
+
+    def _emit(self, kind, name, frame, record, results, fps):
+        for k, v in record["recyclable"].items():
+            self.totals[k] = self.totals.get(k, 0) + v
+        if results:
+            results.write(json.dumps(record) + "\n")
+        if frame is None:
+            return
+        if kind == "images":
+            path = os.path.join(self.output, "annotated", name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            cv2.imwrite(path, frame)
+        else:
+            if self._writer is None:
+                h, w = frame.shape[:2]
+                self._writer = cv2.VideoWriter(os.path.join(self.output, "annotated.mp4"),
+                                               cv2.VideoWriter_fourcc(*"mp4v"), fps or 30.0, (w, h))
+            self._writer.write(frame)
+
+
+def add_arguments(parser):
+    parser.add_argument("--source", default=None,
+                        help="camera index, video file/stream URL or image directory (default: ECOSPY_CAMERA_SOURCE)")
+    parser.add_argument("--output", default=None, help="directory for results.jsonl, summary.json and annotated output")
+    parser.add_argument("--decode-workers", type=int, default=None)
+    parser.add_argument("--infer-workers", type=int, default=None)
+    parser.add_argument("--filter-workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=None)
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--no-annotate", action="store_true", help="only write JSON results")
+
+
+def run_from_args(args):
+    source = config.CAMERA_SOURCE if args.source is None else args.source
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    pipeline = HeadlessPipeline(source, output=args.output, decode_workers=args.decode_workers,
+                                infer_workers=args.infer_workers, filter_workers=args.filter_workers,
+                                batch_size=args.batch_size, queue_size=args.queue_size,
+                                annotate=not args.no_annotate, max_frames=args.max_frames)
+    summary = pipeline.run()
+    print(json.dumps(summary, indent=2))
+    return summary
+
+
+if __name__ == "__main__":
+    # same as `python main.py --headless ...`
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Headless EcoSpy detection pipeline")
+    add_arguments(parser)
+    run_from_args(parser.parse_args())
@@ -0,0 +1,182 @@
+# history_report.py
+# Site-wide reporting over every user's wasteHistory without pulling whole collections.
+#
+#   python history_report.py summary --since 2025-01-01 --by-type
+#   python history_report.py export history.csv --since 2025-01-01
+#   python history_report.py export history.parquet --page-size 1000
+
+import csv
+import time
+
+import config
+
+FIELDS = ["user", "record", "collectionDate", "wasteType", "pointsEarned", "weightKg", "status"]
+
+
+class ReadCounter:
+    """Billed document reads of a report: one per document returned (min. one per query),
+    one per 1000 index entries for an aggregation"""
+
+    def __init__(self):
+        self.reads = 0
+        self.pages = 0
+
+
+def history_query(db, since=None, until=None, waste_type=None):
+    """wasteHistory across all users (collection-group), filtered on collectionDate (ISO strings)"""
+    query = db.collection_group("wasteHistory")
+    if waste_type:
+        query = query.where("wasteType", "==", waste_type)
+    if since:
+        query = query.where("collectionDate", ">=", since)
+    if until:
+        query = query.where("collectionDate", "<", until)
+    return query
+
+
+def iter_history(db, since=None, until=None, page_size=None, counter=None):
+    """Yield wasteHistory snapshots page by page with a start_after cursor.
+
+    Only one page is held at a time, so memory stays flat however long the history is.
+    """
+    page_size = page_size or config.HISTORY_PAGE_SIZE
+    counter = counter or ReadCounter()
+    query = history_query(db, since, until).order_by("collectionDate")
+    last = None
+    while True:
+        page = query.limit(page_size)
+        if last is not None:
+            page = page.start_after(last)
+        docs = list(page.stream())
+        counter.pages += 1
+        counter.reads += max(len(docs), 1)
+        yield from docs
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
+
+def to_rows(snapshots):
+    for snapshot in snapshots:
+        data = snapshot.to_dict() or {}
+        # users/<uid>/wasteHistory/<record>
+        parts = snapshot.reference.path.split("/")
+        row = {field: data.get(field) for field in FIELDS[2:]}
+        row["user"] = parts[-3] if len(parts) >= 3 else ""
+        row["record"] = snapshot.id
+        yield row
+
+
+def write_csv(rows, path):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_parquet(rows, path, row_group_size=None):
+    """Write rows as Parquet one row group at a time (needs pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("❌ Parquet export needs pyarrow (pip install pyarrow), or export to .csv")
+
+    row_group_size = row_group_size or config.HISTORY_PAGE_SIZE
+    schema = pa.schema([("user", pa.string()), ("record", pa.string()), ("collectionDate", pa.string()),
+                        ("wasteType", pa.string()), ("pointsEarned", pa.float64()), ("weightKg", pa.float64()),
+                        ("status", pa.string())])
+    count = 0
+    batch = []
+    with pq.ParquetWriter(path, schema) as writer:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= row_group_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def tally(rows, totals):
+    """Pass rows through while adding them to per-waste-type totals"""
+    for row in rows:
+        entry = totals.setdefault(row["wasteType"] or "Unknown", {"records": 0, "points": 0.0, "weight": 0.0})
+        entry["records"] += 1
+        entry["points"] += row["pointsEarned"] or 0
+        entry["weight"] += row["weightKg"] or 0
+        yield row
+
+
+def summarize(db, since=None, until=None, waste_type=None, counter=None):
+    """Record count and point/weight sums computed server-side with one aggregation query"""
+    counter = counter or ReadCounter()
+    query = history_query(db, since, until, waste_type)
+    result = query.count(alias="records").sum("pointsEarned", alias="points").sum("weightKg", alias="weight").get()
+    values = {r.alias: r.value for r in result[0]}
+    counter.reads += 1 + int(values["records"]) // 1000
+    return {"records": int(values["records"]), "points": values["points"] or 0, "weight": values["weight"] or 0}
+
+
+def waste_types(db, counter=None):
+    """The waste types prices are defined for (recyclable_items), plus "Mixed" which
+    the kiosk records for sessions with several types, for per-type aggregations"""
+    docs = list(db.collection("recyclable_items").stream())
+    if counter:
+        counter.reads += max(len(docs), 1)
+    return sorted({doc.to_dict().get("type") for doc in docs} - {None} | {"Mixed"})
+
+
+def remainder(report):
+    """What the per-type rows of a summary don't cover (types no longer priced, missing wasteType)"""
+    typed = [v for k, v in report.items() if k != "all"]
+    return {key: round(report["all"][key] - sum(v[key] for v in typed), 6) for key in ("records", "points", "weight")}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from firebase_module import init_firebase
+
+    parser = argparse.ArgumentParser(description="Export or summarize wasteHistory across all users")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="stream every record to CSV or Parquet")
+    export.add_argument("output", help="file ending in .csv or .parquet")
+    export.add_argument("--page-size", type=int, default=None)
+    summary = sub.add_parser("summary", help="server-side count/sum, no documents downloaded")
+    summary.add_argument("--by-type", action="store_true", help="one aggregation per waste type")
+    for p in (export, summary):
+        p.add_argument("--since", default=None, help="ISO date, inclusive")
+        p.add_argument("--until", default=None, help="ISO date, exclusive")
+    args = parser.parse_args()
+
+    db = init_firebase()
+    counter = ReadCounter()
+    start = time.perf_counter()
+
+    if args.command == "export":
+        totals = {}
+        rows = tally(to_rows(iter_history(db, args.since, args.until, args.page_size, counter)), totals)
+        if args.output.endswith(".parquet"):
+            count = write_parquet(rows, args.output, args.page_size)
+        else:
+            count = write_csv(rows, args.output)
+        print(f"✅ Exported {count} records to {args.output} in {counter.pages} pages")
+        print(json.dumps(totals, indent=2))
+    else:
+        report = {"all": summarize(db, args.since, args.until, counter=counter)}
+        if args.by_type:
+            for waste_type in waste_types(db, counter):
+                report[waste_type] = summarize(db, args.since, args.until, waste_type, counter)
+            report["other"] = remainder(report)
+        print(json.dumps(report, indent=2))
+
+    print(f"📖 {counter.reads} document reads, {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,165 @@
+# inference_backend.py
+# Export the YOLO weights to CPU-friendly backends and compare them against PyTorch.
+#
+#   python inference_backend.py export --backend openvino-int8
+#   python inference_backend.py compare waste_collected --backends onnx openvino openvino-int8
+#
+# Select the backend used by the kiosk with ECOSPY_MODEL_BACKEND (see config.py).
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import time
+from itertools import islice
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+import config
+from detection_module import iter_image_paths
+from model_registry import BACKEND_PATHS, get_model, model_path
+from waste_mapping import summarize_detections
+
+
+def export(backend, weights=None, imgsz=640, data=None, dynamic=False):
+    """Export `weights` for `backend` and return the path the registry will load it from"""
+    weights = weights or config.MODEL_WEIGHTS
+    target = model_path(weights, backend)
+    base = YOLO(weights)
+
+    if backend == "torch":
+        return weights
+    if backend in ("onnx", "onnx-int8"):
+        exported = base.export(format="onnx", imgsz=imgsz, dynamic=dynamic)
+        if backend == "onnx-int8":
+            # dynamic (weight-only) INT8 quantization needs no calibration data
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(exported, target, weight_type=QuantType.QUInt8)
+            exported = target
+    elif backend == "openvino":
+        exported = base.export(format="openvino", imgsz=imgsz, dynamic=dynamic)
+    elif backend == "openvino-int8":
+        # post-training INT8 quantization calibrated on `data` (an Ultralytics dataset yaml)
+        exported = base.export(format="openvino", imgsz=imgsz, int8=True, data=data or "coco8.yaml")
+    else:
+        raise ValueError(f"Unknown model backend {backend!r}")
+
+    exported = str(exported).rstrip("/\\")
+    if os.path.abspath(exported) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        shutil.move(exported, target)
+    print(f"✅ Exported {weights} for {backend}: {target}")
+    return target
+
+
+def _detections(result):
+    boxes = result.boxes
+    return boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy().astype(int)
+
+
+def _iou_matrix(a, b):
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)))
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_f1(reference, candidate, iou_threshold=0.5):
+    """F1 of class-matched boxes at `iou_threshold` between two (xyxy, cls) detections"""
+    ref_boxes, ref_cls = reference
+    cand_boxes, cand_cls = candidate
+    if not len(ref_cls) and not len(cand_cls):
+        return 1.0
+    ious = _iou_matrix(ref_boxes, cand_boxes)
+    used = np.zeros(len(cand_cls), dtype=bool)
+    matched = 0
+    order = np.argsort(-ious.max(axis=1)) if ious.size else []
+    for i in order:
+        allowed = (cand_cls == ref_cls[i]) & ~used
+        if not allowed.any():
+            continue
+        j = int(np.argmax(np.where(allowed, ious[i], -1.0)))
+        if ious[i, j] >= iou_threshold:
+            used[j] = True
+            matched += 1
+    return 2 * matched / (len(ref_cls) + len(cand_cls))
+
+
+def _run(model, frames):
+    latencies, detections, summaries = [], [], []
+    for frame in frames:
+        start = time.perf_counter()
+        result = model(frame, verbose=False)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections.append(_detections(result))
+        summaries.append(summarize_detections(result)[1])
+    return latencies, detections, summaries
+
+
+def compare(image_dir, backends, weights=None, limit=50, iou_threshold=0.5):
+    """Latency and detection agreement of each backend against the PyTorch baseline"""
+    paths = list(islice(iter_image_paths(image_dir), limit))
+    frames = [f for f in (cv2.imread(p) for p in paths) if f is not None]
+    if not frames:
+        raise SystemExit(f"❌ No readable images in {image_dir}")
+
+    base_lat, base_det, base_sum = _run(get_model(model_path(weights, "torch")), frames)
+    report = {"images": len(frames), "backends": {}}
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        if backend == "torch":
+            lat, det, summ = base_lat, base_det, base_sum
+        else:
+            lat, det, summ = _run(get_model(model_path(weights, backend)), frames)
+        report["backends"][backend] = {
+            "p50_ms": statistics.median(lat),
+            "p95_ms": float(np.percentile(lat, 95)),
+            "speedup": statistics.median(base_lat) / statistics.median(lat),
+            "box_f1": float(np.mean([match_f1(r, c, iou_threshold) for r, c in zip(base_det, det)])),
+            "count_agreement": float(np.mean([r == c for r, c in zip(base_sum, summ)])),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 {report['images']} images, PyTorch baseline")
+    print(f"{'backend':<15}{'p50 ms':>9}{'p95 ms':>9}{'speedup':>9}{'box F1':>9}{'counts':>9}")
+    for backend, r in report["backends"].items():
+        print(f"{backend:<15}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['speedup']:>8.2f}x"
+              f"{r['box_f1']:>9.3f}{r['count_agreement']:>9.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and compare CPU inference backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="export the weights for a backend")
+    exp.add_argument("--backend", choices=[b for b in BACKEND_PATHS if b != "torch"], default="openvino-int8")
+    exp.add_argument("--weights", default=None)
+    exp.add_argument("--imgsz", type=int, default=640)
+    exp.add_argument("--data", default=None, help="dataset yaml used to calibrate INT8 (openvino-int8)")
+    exp.add_argument("--dynamic", action="store_true", help="allow variable input sizes")
+
+    cmp_ = sub.add_parser("compare", help="compare backends against PyTorch on local images")
+    cmp_.add_argument("images", nargs="?", default="waste_collected")
+    cmp_.add_argument("--backends", nargs="+", default=["onnx", "openvino", "openvino-int8"])
+    cmp_.add_argument("--weights", default=None)
+    cmp_.add_argument("--limit", type=int, default=50)
+    cmp_.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export(args.backend, args.weights, imgsz=args.imgsz, data=args.data, dynamic=args.dynamic)
+    else:
+        result = compare(args.images, args.backends, weights=args.weights, limit=args.limit)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print_report(result)
@@ -0,0 +1,469 @@
+# inference_server.py
+# One model process serving several cameras.
+#
+#   python inference_server.py serve
+#   python inference_server.py client --source 0 --name bin1
+#   python inference_server.py demo bin1.mp4 bin2.mp4 bin3.mp4     # video files stand in for cameras
+#
+# Each client owns a shared-memory ring of frame slots. It writes a frame into a
+# free slot and sends only (slot, seq) over a multiprocessing.connection channel;
+# the server reads the slot in place, batches the newest frame of every stream
+# into one model call and sends the detections back. Messages are a JSON header
+# plus raw numpy buffers (send_bytes/recv_bytes), never pickles, so a peer can't
+# run code on the other side. With ECOSPY_INFERENCE_SERVER_ENABLED=1
+# the kiosk GUI uses RemoteModel instead of loading its own copy of the model.
+
+import argparse
+import json
+import struct
+import threading
+import time
+from multiprocessing import Process, Queue
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+
+import cv2
+import numpy as np
+
+import config
+from model_registry import get_model
+
+
+def _address():
+    return (config.INFERENCE_SERVER_HOST, config.INFERENCE_SERVER_PORT)
+
+
+def _attach(name):
+    """Attach to a client's shared memory without letting this process unlink it at exit"""
+    try:
+        return SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def _send(conn, message):
+    """Send a dict: its numpy values as raw bytes, everything else in a JSON header"""
+    header, arrays, buffers = {}, [], []
+    for key, value in message.items():
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            arrays.append([key, value.dtype.str, value.shape])
+            buffers.append(value.tobytes())
+        else:
+            header[key] = value
+    header["_arrays"] = arrays
+    head = json.dumps(header).encode()
+    conn.send_bytes(b"".join([struct.pack("!I", len(head)), head, *buffers]))
+
+
+def _receive(conn):
+    """Inverse of _send(); raises ValueError on a malformed message"""
+    data = conn.recv_bytes()
+    (size,) = struct.unpack_from("!I", data)
+    message = json.loads(data[4:4 + size])
+    offset = 4 + size
+    for key, dtype, shape in message.pop("_arrays"):
+        dtype = np.dtype(dtype)
+        if dtype.hasobject:
+            raise ValueError("object arrays are not accepted")
+        count = int(np.prod(shape))
+        message[key] = np.frombuffer(data, dtype, count, offset).reshape(shape)
+        offset += count * dtype.itemsize
+    return message
+
+
+class _Stream:
+    def __init__(self, conn, hello):
+        self.conn = conn
+        self.name = hello["stream"]
+        self.shape = tuple(hello["shape"])
+        self.slots = hello["slots"]
+        self.shm = _attach(hello["shm"])
+        self.frame_bytes = int(np.prod(self.shape))
+        self.frames = 0
+        self._send_lock = threading.Lock()
+
+    def view(self, slot):
+        return np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.frame_bytes)
+
+    def reply(self, message):
+        with self._send_lock:
+            try:
+                _send(self.conn, message)
+            except (OSError, EOFError):
+                pass
+
+    def close(self):
+        self.conn.close()
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a batch still holds a view; the mapping goes away with it
+
+
+class InferenceServer:
+    """Accepts capture clients and batches their newest frames into shared model calls"""
+
+    def __init__(self, address=None, max_batch=None, max_wait_ms=None, imgsz=None):
+        self.address = address or _address()
+        self.max_batch = max_batch or config.INFERENCE_SERVER_MAX_BATCH
+        self.max_wait = (config.INFERENCE_SERVER_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.imgsz = imgsz or config.INFERENCE_IMGSZ
+        self.model = get_model()
+        self._pending = {}  # stream -> (stream, slot, seq); newest frame per stream wins
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self.batches = 0
+        self.frames = 0
+        self.dropped = 0
+
+    def serve_forever(self):
+        if self.address[0] not in ("127.0.0.1", "localhost", "::1") and config.INFERENCE_SERVER_AUTHKEY == b"ecospy":
+            raise SystemExit("❌ Set ECOSPY_INFERENCE_SERVER_AUTHKEY before serving on a non-local address")
+        listener = Listener(self.address, authkey=config.INFERENCE_SERVER_AUTHKEY)
+        print(f"🛰️ Inference server listening on {self.address[0]}:{self.address[1]}")
+        threading.Thread(target=self._batch_loop, name="ecospy-batcher", daemon=True).start()
+        try:
+            while not self._stop.is_set():
+                conn = listener.accept()
+                threading.Thread(target=self._client_loop, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def stats(self):
+        return {"batches": self.batches, "frames": self.frames, "dropped": self.dropped,
+                "mean_batch": self.frames / self.batches if self.batches else 0.0}
+
+    def _client_loop(self, conn):
+        try:
+            stream = _Stream(conn, _receive(conn))
+        except (OSError, EOFError, KeyError, ValueError, struct.error):
+            conn.close()
+            return
+        stream.reply({"names": {str(k): v for k, v in self.model.names.items()}})
+        print(f"📷 Stream {stream.name} connected ({stream.shape[1]}x{stream.shape[0]}, {stream.slots} slots)")
+        try:
+            while True:
+                message = _receive(conn)
+                if message["type"] == "bye":
+                    break
+                slot, seq = int(message["slot"]), int(message["seq"])
+                if not 0 <= slot < stream.slots:
+                    raise ValueError(f"slot {slot} out of range")
+                # keyed by connection, not by the client-chosen name: two clients may share a name
+                with self._cond:
+                    previous = self._pending.pop(stream, None)
+                    self._pending[stream] = (stream, slot, seq)
+                    self._cond.notify()
+                if previous:
+                    # a newer frame arrived before the old one was batched: release its slot
+                    self.dropped += 1
+                    previous[0].reply({"seq": previous[2], "slot": previous[1], "dropped": True})
+        except (OSError, EOFError):
+            pass
+        except (KeyError, ValueError, struct.error) as e:
+            print(f"⚠️ Dropping stream {stream.name}: malformed message ({e})")
+        finally:
+            with self._cond:
+                self._pending.pop(stream, None)
+            print(f"📷 Stream {stream.name} disconnected after {stream.frames} frames")
+            stream.close()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._stop.is_set():
+                self._cond.wait()
+            # give the other streams a moment to land their frames in the same batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            streams = list(self._pending)[:self.max_batch]
+            return [self._pending.pop(stream) for stream in streams]
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # e.g. a client closed its shared memory mid-batch: answer every frame of the
+                # batch so no client waits forever, and keep serving the others
+                print(f"❌ Inference batch of {len(batch)} failed: {e}")
+                for stream, slot, seq in batch:
+                    stream.reply({"seq": seq, "slot": slot, "error": str(e)})
+
+    def _run_batch(self, batch):
+        frames = [stream.view(slot) for stream, slot, _ in batch]
+        results = self.model(frames, imgsz=self.imgsz, verbose=False)
+        del frames
+        self.batches += 1
+        self.frames += len(batch)
+        for (stream, slot, seq), result in zip(batch, results):
+            stream.frames += 1
+            boxes = result.boxes
+            stream.reply({"seq": seq, "slot": slot,
+                          "xyxy": boxes.xyxy.cpu().numpy(),
+                          "cls": boxes.cls.cpu().numpy().astype(np.intp),
+                          "conf": boxes.conf.cpu().numpy()})
+        # results keep references to the shared-memory views; drop them before the next wait
+        del results, result
+
+
+class InferenceClient:
+    """Capture-side handle: writes frames into its shared-memory ring and receives detections"""
+
+    def __init__(self, name, shape, slots=4, address=None, connect_timeout=10.0):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.frame_bytes = int(np.prod(self.shape))
+        self.shm = SharedMemory(create=True, size=self.frame_bytes * slots)
+        self._free = list(range(slots))
+        self._backlog = []
+        self._seq = 0
+
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                self.conn = Client(address or _address(), authkey=config.INFERENCE_SERVER_AUTHKEY)
+                break
+            except ConnectionRefusedError:
+                if time.monotonic() > deadline:
+                    self.shm.close()
+                    self.shm.unlink()
+                    raise
+                time.sleep(0.2)
+        _send(self.conn, {"stream": name, "shm": self.shm.name, "shape": self.shape, "slots": slots})
+        self.names = {int(k): v for k, v in _receive(self.conn)["names"].items()}
+
+    def acquire(self):
+        """Return (slot, view) of a free slot to fill, waiting for a reply if all are in flight.
+
+        Replies that arrive while waiting are returned by the next receive() calls.
+        """
+        while not self._free:
+            self._backlog.append(self._recv())
+        slot = self._free.pop()
+        view = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.frame_bytes)
+        return slot, view
+
+    def release(self, slot):
+        """Give back a slot from acquire() that was not submitted"""
+        self._free.append(slot)
+
+    def submit(self, slot):
+        self._seq += 1
+        _send(self.conn, {"type": "frame", "slot": slot, "seq": self._seq})
+        return self._seq
+
+    def receive(self):
+        """Next reply: a dict with seq, xyxy, cls, conf — or dropped=True if the server skipped the frame"""
+        if self._backlog:
+            return self._backlog.pop(0)
+        return self._recv()
+
+    def infer(self, frame):
+        """Synchronous helper: copy `frame` into a slot and wait for its detections"""
+        slot, view = self.acquire()
+        np.copyto(view, frame)
+        seq = self.submit(slot)
+        while True:
+            reply = self.receive()
+            if reply["seq"] == seq:
+                if "error" in reply:
+                    raise RuntimeError(f"Inference server failed: {reply['error']}")
+                return reply
+
+    def close(self):
+        try:
+            _send(self.conn, {"type": "bye"})
+        except OSError:
+            pass
+        self.conn.close()
+        self.shm.close()
+        self.shm.unlink()
+
+    def _recv(self):
+        reply = _receive(self.conn)
+        self._free.append(reply["slot"])
+        return reply
+
+
+class _Array:
+    """numpy array with the .cpu().numpy() chain of a torch tensor"""
+
+    def __init__(self, array):
+        self._array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._array
+
+    def __len__(self):
+        return len(self._array)
+
+
+class _Boxes:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = _Array(xyxy)
+        self.cls = _Array(cls)
+        self.conf = _Array(conf)
+
+    def __len__(self):
+        return len(self.cls)
+
+
+class RemoteResult:
+    """The parts of an ultralytics Results the app reads (boxes, names, orig_shape), from a server reply"""
+
+    def __init__(self, reply, names, orig_shape):
+        self.names = names
+        self.orig_shape = orig_shape
+        self.boxes = _Boxes(reply["xyxy"], reply["cls"], reply["conf"])
+
+
+class RemoteModel:
+    """Drop-in for a YOLO model that sends frames to the site's inference server.
+
+    `model(frame, imgsz=..., conf=..., verbose=False)` returns `[RemoteResult]` like a
+    local model. The server runs every stream at its own imgsz, so `imgsz` is ignored;
+    `conf` is applied here. Not thread-safe: call it from one thread at a time, as
+    with a local predictor.
+    """
+
+    honours_imgsz = False  # see model_registry.honours_imgsz
+
+    def __init__(self, name=None, address=None):
+        self.name = name or config.INFERENCE_STREAM_NAME
+        self.address = address
+        self._client = None
+        self.names = None
+
+    def __call__(self, frame, imgsz=None, conf=None, verbose=False):
+        if self._client is None or self._client.shape != frame.shape:
+            self.close()
+            self._client = InferenceClient(self.name, frame.shape, slots=2, address=self.address)
+            self.names = self._client.names
+        reply = self._client.infer(frame)
+        if conf is not None:
+            keep = reply["conf"] >= conf
+            reply = {key: reply[key][keep] for key in ("xyxy", "cls", "conf")}
+        return [RemoteResult(reply, self.names, frame.shape[:2])]
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+def run_client(source, name, max_frames=None, realtime=False, in_flight=2):
+    """Feed a camera index or video file through the server; returns throughput stats"""
+    cap = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    ret, first = cap.read()
+    if not ret:
+        raise SystemExit(f"❌ Cannot read from {source}")
+    frame_interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0)
+
+    client = InferenceClient(name, first.shape, slots=in_flight + 1)
+    detections = replies = 0
+    sent = 0
+    start = time.perf_counter()
+    try:
+        while max_frames is None or sent < max_frames:
+            slot, view = client.acquire()
+            if first is not None:
+                np.copyto(view, first)
+                first = None
+            else:
+                # decode straight into the shared-memory slot
+                ret, out = cap.read(view)
+                if ret and not np.shares_memory(out, view):
+                    np.copyto(view, out)
+            if not ret:
+                client.release(slot)
+                break
+            client.submit(slot)
+            sent += 1
+            while sent - replies > in_flight - 1:
+                reply = client.receive()
+                replies += 1
+                detections += 0 if reply.get("dropped") else len(reply["cls"])
+            if realtime:
+                time.sleep(frame_interval)
+        while replies < sent:
+            reply = client.receive()
+            replies += 1
+            detections += 0 if reply.get("dropped") else len(reply["cls"])
+    finally:
+        cap.release()
+        client.close()
+    elapsed = time.perf_counter() - start
+    return {"stream": name, "frames": sent, "fps": sent / elapsed, "detections": detections}
+
+
+def _client_process(source, name, max_frames, realtime, results):
+    results.put(run_client(source, name, max_frames=max_frames, realtime=realtime))
+
+
+def _server_process(max_batch):
+    InferenceServer(max_batch=max_batch).serve_forever()
+
+
+def demo(sources, max_frames=300, realtime=False, max_batch=None):
+    """Run a server plus one client process per video file and report aggregate throughput"""
+    server = Process(target=_server_process, args=(max_batch,), daemon=True)
+    server.start()
+    results = Queue()
+    clients = [Process(target=_client_process, args=(src, f"cam{i}", max_frames, realtime, results))
+               for i, src in enumerate(sources)]
+    start = time.perf_counter()
+    for p in clients:
+        p.start()
+    streams = [results.get() for _ in clients]
+    for p in clients:
+        p.join()
+    elapsed = time.perf_counter() - start
+    server.terminate()
+    total = sum(s["frames"] for s in streams)
+    return {"streams": streams, "total_frames": total, "total_fps": total / elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared multi-camera inference server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    srv = sub.add_parser("serve")
+    srv.add_argument("--max-batch", type=int, default=None)
+    cli = sub.add_parser("client")
+    cli.add_argument("--source", default="0", help="camera index or video file")
+    cli.add_argument("--name", default="cam0")
+    cli.add_argument("--max-frames", type=int, default=None)
+    dem = sub.add_parser("demo")
+    dem.add_argument("sources", nargs="+", help="video files standing in for cameras")
+    dem.add_argument("--max-frames", type=int, default=300)
+    dem.add_argument("--max-batch", type=int, default=None)
+    dem.add_argument("--realtime", action="store_true", help="pace each video at its own frame rate")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        InferenceServer(max_batch=args.max_batch).serve_forever()
+    elif args.command == "client":
+        print(json.dumps(run_client(args.source, args.name, max_frames=args.max_frames), indent=2))
+    else:
+        print(json.dumps(demo(args.sources, args.max_frames, args.realtime, args.max_batch), indent=2))
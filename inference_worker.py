@@ -0,0 +1,186 @@
+# inference_worker.py
+
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+import metrics
+
+
+class LatestFrameQueue:
+    """Bounded queue where a new item replaces the oldest one instead of blocking"""
+
+    def __init__(self, maxsize=1):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+
+class LiveDetector:
+    """Capture thread + inference worker feeding the newest annotated frame to the UI.
+
+    `infer(frame)` runs the model and returns its results, `render(frame, results)`
+    turns them into whatever the display loop wants to show. Both run on the
+    worker thread, so the caller's event loop only has to pick up `latest_output()`.
+    With a `gate` (see motion_gate.MotionGate) the last results are re-rendered on
+    new frames instead of running `infer` while the scene is static, and with a
+    `controller` (see quality_controller.QualityController) only every Nth frame
+    is inferred and each finished frame is reported back to it. A failing `infer`
+    or `render` is logged and the frame skipped; after `max_errors` failures in a
+    row the worker gives up, keeps the exception in `error` and sets `ended`.
+    """
+
+    def __init__(self, infer, render, source=0, gate=None, controller=None, max_errors=3):
+        self.infer = infer
+        self.render = render
+        self.source = source
+        self.gate = gate
+        self.controller = controller
+        self.max_errors = max_errors
+        self.error = None
+        self.cap = None
+        self.frames = LatestFrameQueue(maxsize=1)
+        self._stop = threading.Event()
+        self.ended = threading.Event()  # set when a video file runs out of frames or the worker gives up
+        self._lock = threading.Lock()
+        self._threads = []
+        self._latest_frame = None
+        self._output = None
+        self._output_seq = 0
+        self._detection = None
+
+    def start(self):
+        """Open the camera and start both threads; returns False if the camera is unavailable"""
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            return False
+
+        self._stop.clear()
+        self.ended.clear()
+        self.error = None
+        self._detection = None
+        if self.controller:
+            self.controller.restart()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="ecospy-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="ecospy-inference", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return True
+
+    def stop(self, timeout=0.5):
+        """Stop both threads; with timeout=None, wait until the worker is done with the model"""
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def latest_frame(self):
+        """Newest raw camera frame (BGR), or None before the first read"""
+        with self._lock:
+            return None if self._latest_frame is None else self._latest_frame.copy()
+
+    def latest_detection(self, max_age):
+        """Return (frame, results) for the newest frame inferred at full quality if it is at most `max_age` seconds old.
+
+        Only results produced at full quality (controller, if any, at level 0) are kept,
+        paired with the frame they were inferred on or with a later frame the motion
+        gate judged unchanged from it (stamped when the gate judged it), so they match
+        what a fresh inference at the default settings would return.
+        """
+        with self._lock:
+            if self._detection is None:
+                return None
+            frame, results, stamp = self._detection
+        if time.monotonic() - stamp > max_age:
+            return None
+        return frame.copy(), results
+
+    def latest_output(self, after_seq=0):
+        """Return (seq, payload) for the newest rendered frame if it is newer than `after_seq`"""
+        with self._lock:
+            if self._output is None or self._output_seq <= after_seq:
+                return None
+            return self._output_seq, self._output
+
+    def _capture_loop(self):
+        cap = self.cap
+        try:
+            while not self._stop.is_set():
+                with metrics.span("capture"):
+                    ret, frame = cap.read()
+                if not ret:
+                    if isinstance(self.source, str) and os.path.isfile(self.source):
+                        # a recording is exhausted; cameras and streams can have transient read failures
+                        self.ended.set()
+                        return
+                    time.sleep(0.01)
+                    continue
+                with self._lock:
+                    self._latest_frame = frame
+                self.frames.put(frame)
+        finally:
+            cap.release()
+
+    def _inference_loop(self):
+        results = None
+        results_exact = False  # `results` were inferred at full quality
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            due = self.controller is None or self.controller.should_infer()
+            unchanged = due and self.gate is not None and not self.gate.should_infer(frame)
+            # the controller only changes level in frame_done() below, on this thread
+            full_quality = self.controller is None or self.controller.level == 0
+            # a frame the gate found unchanged can keep the results of the frame it matched
+            exact = unchanged and results_exact and full_quality
+            try:
+                if (due and not unchanged) or results is None:
+                    exact = results_exact = False
+                    with metrics.span("infer"):
+                        results = self.infer(frame)
+                    metrics.tick("inference")
+                    exact = results_exact = full_quality
+                with metrics.span("render"):
+                    payload = self.render(frame, results)
+            except Exception as e:
+                # e.g. the inference server is down: skip the frame, give up if it keeps failing
+                failures += 1
+                print(f"⚠️ Live inference failed ({failures}/{self.max_errors}): {e!r}")
+                if failures >= self.max_errors:
+                    self.error = e
+                    self.ended.set()
+                    return
+                continue
+            failures = 0
+            with self._lock:
+                if exact:
+                    self._detection = (frame, results, time.monotonic())
+                self._output = payload
+                self._output_seq += 1
+            if self.controller:
+                self.controller.frame_done(time.perf_counter() - started)
@@ -1,55 +1,71 @@
 import cv2
 import os
+from filename_allocator import allocate_filename
 from collections import Counter
-from ultralytics import YOLO
-from waste_mapping import check_recyclability
+from model_registry import get_model
+from waste_mapping import summarize_detections
+from archive_writer import archive_writer
+from pricing_cache import get_pricing_cache
+from user_lookup import get_user_resolver
+from detection_log import detection_log, new_session_id
 
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import firestore
+from firebase_module import init_firebase, run_transaction
 from datetime import datetime
+import config
+import metrics
 
 
-cred = credentials.Certificate("serviceAccountKey.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-print("✅ Firebase setup complete!")
+_db = None
 
 
-model = YOLO("yolov8n.pt")
-folder = "waste_collected"
+def get_db():
+    """The Firestore client, connected on first use (headless runs never need it)"""
+    global _db
+    if _db is None:
+        _db = init_firebase()
+    return _db
+
+
+def __getattr__(name):
+    # 🔹 keeps `from main import db` working without connecting at import time
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+folder = config.ARCHIVE_DIR
 os.makedirs(folder, exist_ok=True)
 
 def get_next_filename():
-    existing = [int(f.split(".")[0]) for f in os.listdir(folder) if f.endswith(".jpg")]
-    next_index = max(existing, default=0) + 1
-    return os.path.join(folder, f"{next_index}.jpg")
+    return allocate_filename(folder, ext=config.ARCHIVE_FORMAT)
 
 
 
-def detect_recyclables(model, filename):
-    """Return all detected items and recyclable items dictionary"""
-    results = model(filename)
-    all_detected_items = []
-    recyclable_items = {}
-    for box in results[0].boxes:
-        cls = int(box.cls[0])
-        label = results[0].names[cls].lower()
-        all_detected_items.append(label)
-        if check_recyclability(label) == "Recyclable":
-            recyclable_items[label] = recyclable_items.get(label, 0) + 1
-    return all_detected_items, recyclable_items
+def detect_recyclables(model, source):
+    """Return all detected items and recyclable items dictionary.
+
+    `source` is an image path or an in-memory BGR frame (numpy array).
+    """
+    results = model(source)
+    return summarize_detections(results[0])
 
 def calculate_payout(db, recyclable_items):
     """Return total payout, total weight, and final waste type"""
+    with metrics.span("calculate_payout"):
+        return _calculate_payout(db, recyclable_items)
+
+
+def _calculate_payout(db, recyclable_items):
     total_payout = 0
     total_weight = 0.0
     item_types = set()  
+    pricing = get_pricing_cache(db)
 
     for item, qty in recyclable_items.items():
-        doc = db.collection("recyclable_items").document(item).get()
-        if doc.exists:
-            data = doc.to_dict()
+        data = pricing.get(item)
+        if data is not None:
             price = data.get("price", 0)
             weight = data.get("weight", 0.0)
             waste_type = data.get("type", "Mixed")
@@ -70,34 +86,112 @@ def calculate_payout(db, recyclable_items):
 
 
 def update_firebase(user_ref, total_payout, total_weight, waste_type):
-    """Update user EcoPoints, waste collected, and add wasteHistory record"""
-    existing_weight = user_ref.get().to_dict().get("wastecollected", 0)
-    new_total_weight = existing_weight + total_weight
-
-    
-    user_ref.update({
-        "ecopoints": firestore.Increment(total_payout),
-        "wastecollected": new_total_weight
-    })
-
-    
-    waste_history_ref = user_ref.collection("wasteHistory")
-    docs = list(waste_history_ref.stream())
-    next_doc_id = f"DOC{len(docs)+1:03}"
-    waste_history_ref.document(next_doc_id).set({
-        "collectionDate": datetime.utcnow().isoformat(),
-        "location": [28.61, 77.20],  
-        "pointsEarned": total_payout,
-        "status": "Recycled",
-        "wasteType": waste_type,
-        "weightKg": total_weight
-    })
-
-    return new_total_weight
+    """Update user EcoPoints, waste collected, and add wasteHistory record.
+
+    Everything is committed in one transaction with a single read of the user
+    document, so the cost does not depend on how long the user's history is.
+    Returns the new (wastecollected, ecopoints) totals.
+    """
+    return commit_payouts(get_db(), [{
+        "user_ref": user_ref,
+        "points": total_payout,
+        "weight": total_weight,
+        "waste_type": waste_type,
+    }])[0]
+
+
+def commit_payouts(db, payouts):
+    """Commit several payouts in one transaction and return the new totals for each.
+
+    Each payout is a dict with user_ref, points, weight, waste_type and optionally
+    `key` (an idempotency key: a payout whose key was already applied is skipped
+    and gets None) and `collected_at` (ISO timestamp, defaults to now).
+    """
+    with metrics.span("commit_payouts"):
+        return run_transaction(db, _commit_payouts, payouts)
+
+
+def _commit_payouts(transaction, payouts):
+    # all reads first, as Firestore transactions require
+    users = {}
+    for payout in payouts:
+        user_ref = payout["user_ref"]
+        if user_ref.path not in users:
+            user_data = user_ref.get(transaction=transaction).to_dict() or {}
+            history_count = user_data.get("historyCount")
+            if history_count is None:
+                # users created before the counter existed: seed it once with a server-side count
+                history_count = user_ref.collection("wasteHistory").count().get()[0][0].value
+            users[user_ref.path] = {
+                "ref": user_ref,
+                "history_count": history_count,
+                "wastecollected": user_data.get("wastecollected", 0),
+                "ecopoints": user_data.get("ecopoints", 0),
+                "added_points": 0,
+                "added_weight": 0.0,
+                "applied": 0,
+            }
+    applied = {payout["key"] for payout in payouts if payout.get("key") and
+               payout["user_ref"].collection("payoutKeys").document(payout["key"]).get(transaction=transaction).exists}
+
+    totals = []
+    for payout in payouts:
+        user_ref = payout["user_ref"]
+        if payout.get("key") in applied:
+            totals.append(None)
+            continue
+        user = users[user_ref.path]
+        user["history_count"] += 1
+        user["wastecollected"] += payout["weight"]
+        user["ecopoints"] += payout["points"]
+        user["added_points"] += payout["points"]
+        user["added_weight"] += payout["weight"]
+        user["applied"] += 1
+        next_doc_id = f"DOC{user['history_count']:03}"
+
+        transaction.set(user_ref.collection("wasteHistory").document(next_doc_id), {
+            "collectionDate": payout.get("collected_at") or datetime.utcnow().isoformat(),
+            "location": [28.61, 77.20],  
+            "pointsEarned": payout["points"],
+            "status": "Recycled",
+            "wasteType": payout["waste_type"],
+            "weightKg": payout["weight"]
+        })
+        if payout.get("key"):
+            transaction.set(user_ref.collection("payoutKeys").document(payout["key"]),
+                            {"historyId": next_doc_id, "appliedAt": datetime.utcnow().isoformat()})
+
+        totals.append((user["wastecollected"], user["ecopoints"]))
+
+    # one write per user, however many of their payouts are in this batch
+    for user in users.values():
+        if user["applied"]:
+            transaction.update(user["ref"], {
+                "ecopoints": firestore.Increment(user["added_points"]),
+                "wastecollected": firestore.Increment(user["added_weight"]),
+                "historyCount": user["history_count"]
+            })
+
+    return totals
 
 
 if __name__ == "__main__":
-    cap = cv2.VideoCapture(0)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="EcoSpy kiosk (interactive), or a headless detection pipeline")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window or prompts: detect over a camera, video or image folder and write results")
+    headless_args = parser.add_argument_group("headless mode")
+    from headless import add_arguments, run_from_args
+    add_arguments(headless_args)
+    args = parser.parse_args()
+    if args.headless:
+        run_from_args(args)
+        raise SystemExit(0)
+
+    db = get_db()
+    model = get_model()
+    cap = cv2.VideoCapture(config.CAMERA_SOURCE)
     print("📷 Press 'P' to capture with detection, 'Q' to quit")
 
     filename = None
@@ -113,8 +207,8 @@ if __name__ == "__main__":
         key = cv2.waitKey(1) & 0xFF
         if key == ord('p'):
             filename = get_next_filename()
-            cv2.imwrite(filename, frame)
-            print(f"✅ Captured & saved {filename}")
+            archive_writer.submit(filename, frame)
+            print(f"✅ Captured {filename}")
             break
         elif key == ord('q'):
             cap.release()
@@ -129,7 +223,10 @@ if __name__ == "__main__":
         exit()
 
     
-    all_detected_items, recyclable_items = detect_recyclables(model, filename)
+    # 🔹 The live loop already ran the model on the captured frame
+    all_detected_items, recyclable_items = summarize_detections(results[0])
+    session = new_session_id()
+    detection_log.record_capture(results[0], session)
 
     print("\n♻️ Final Detection on Captured Image")
     print("All Detected Items:", all_detected_items)
@@ -145,24 +242,10 @@ if __name__ == "__main__":
             print("❌ Exiting program.")
             exit()
 
-        users_ref = db.collection("users")
-        query = users_ref.where("email", "==", user_input).limit(1).get()
-        if not query:
-            query = users_ref.where("phone", "==", user_input).limit(1).get()
-        if not query:
-            query = users_ref.where("mobile", "==", user_input).limit(1).get()
-
-        if query:
-            user_doc = query[0]
-            user_ref = user_doc.reference
-            user_data = user_doc.to_dict()
-
-            
-            if "mobilemobile" in user_data:
-                user_data["mobile"] = user_data.pop("mobilemobile")
+        found = get_user_resolver(db).resolve(user_input)
 
-            allowed_fields = ["name", "email", "phone", "mobile", "ecopoints", "wastecollected"]
-            user_data = {k: v for k, v in user_data.items() if k in allowed_fields}
+        if found:
+            user_ref, user_data = found
 
            
             print("\n🔎 User Found!")
@@ -187,14 +270,17 @@ if __name__ == "__main__":
     print(f"\n💰 Total Payout: {total_payout} points")
     print(f"⚖️ Total Weight: {total_weight} kg")
     print(f"🗑️ Waste Type: {waste_type_final}")
+    print(get_pricing_cache(db).report())
 
     confirm = input("Do you want to add this amount to user EcoPoints? (y/n): ").strip().lower()
     if confirm != 'y':
         print("❌ Transaction cancelled.")
         exit()
 
-    updated_weight = update_firebase(user_ref, total_payout, total_weight, waste_type_final)
+    updated_weight, new_ecopoints = update_firebase(user_ref, total_payout, total_weight, waste_type_final)
+    get_user_resolver(db).forget(user_ref)
+    detection_log.record_payout(session, total_payout, total_weight)
 
     print(f"\n✅ EcoPoints updated! {user_data['name']} received {total_payout} points.")
-    print(f"💰 New EcoPoints: {user_data['ecopoints'] + total_payout}")
+    print(f"💰 New EcoPoints: {new_ecopoints}")
     print(f"⚖️ Total Waste Collected (all time): {updated_weight} kg")
@@ -0,0 +1,177 @@
+# metrics.py
+# Lightweight hot-path timing. When disabled, span() hands back one shared no-op
+# context manager, so instrumented code pays a function call and nothing else.
+#
+#   with metrics.span("infer"):
+#       results = model(frame)
+
+import os
+import threading
+import time
+from collections import deque
+
+import config
+
+enabled = config.METRICS_ENABLED
+
+_histograms = {}
+_rates = {}
+_gauges = {}
+_lock = threading.Lock()
+_exporter = None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class RollingHistogram:
+    """Last `window` samples (for percentiles) plus lifetime count and sum"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self, qs=(0.5, 0.95, 0.99)):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in qs}
+        return {q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] for q in qs}
+
+
+def span(name):
+    """Context manager timing one stage; a shared no-op when metrics are disabled"""
+    return _Span(name) if enabled else _NULL_SPAN
+
+
+def observe(name, seconds):
+    if not enabled:
+        return
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = RollingHistogram(config.METRICS_WINDOW)
+        hist.add(seconds)
+
+
+def tick(name):
+    """Count one event (e.g. a displayed frame) for rate()"""
+    if not enabled:
+        return
+    with _lock:
+        stamps = _rates.get(name)
+        if stamps is None:
+            stamps = _rates[name] = deque(maxlen=config.METRICS_WINDOW)
+        stamps.append(time.monotonic())
+
+
+def gauge(name, read):
+    """Export `read()` as the gauge ecospy_<name>; it is called at export time"""
+    with _lock:
+        _gauges[name] = read
+
+
+def rate(name):
+    """Events per second over the recent window"""
+    with _lock:
+        stamps = _rates.get(name)
+        if not stamps or len(stamps) < 2:
+            return 0.0
+        return (len(stamps) - 1) / max(stamps[-1] - stamps[0], 1e-9)
+
+
+def snapshot():
+    """{stage: {"count", "sum", "p50", "p95", "p99"}} in seconds"""
+    with _lock:
+        items = list(_histograms.items())
+    result = {}
+    for name, hist in items:
+        q = hist.quantiles()
+        result[name] = {"count": hist.count, "sum": hist.total, "p50": q[0.5], "p95": q[0.95], "p99": q[0.99]}
+    return result
+
+
+def overlay_text(stages=("capture", "infer", "render", "blit")):
+    """One-line summary for the on-screen overlay"""
+    stats = snapshot()
+    parts = [f"display {rate('display'):.1f} fps", f"model {rate('inference'):.1f} fps"]
+    for stage in stages:
+        if stage in stats:
+            parts.append(f"{stage} {stats[stage]['p50'] * 1000:.0f}/{stats[stage]['p95'] * 1000:.0f} ms")
+    return "  |  ".join(parts)
+
+
+def prometheus_text():
+    lines = ["# HELP ecospy_stage_seconds Time spent in each EcoSpy pipeline stage.",
+             "# TYPE ecospy_stage_seconds summary"]
+    for name, s in sorted(snapshot().items()):
+        for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+            lines.append(f'ecospy_stage_seconds{{stage="{name}",quantile="{quantile}"}} {s[key]:.6f}')
+        lines.append(f'ecospy_stage_seconds_sum{{stage="{name}"}} {s["sum"]:.6f}')
+        lines.append(f'ecospy_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+    lines += ["# HELP ecospy_rate_per_second Recent event rate.", "# TYPE ecospy_rate_per_second gauge"]
+    with _lock:
+        names = sorted(_rates)
+    for name in names:
+        lines.append(f'ecospy_rate_per_second{{event="{name}"}} {rate(name):.3f}')
+    with _lock:
+        gauges = sorted(_gauges.items())
+    for name, read in gauges:
+        lines += [f"# TYPE ecospy_{name} gauge", f"ecospy_{name} {read()}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Write the metrics atomically, as the node_exporter textfile collector expects"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def start_exporter(path=None, interval=None):
+    """Periodically write the Prometheus textfile in the background (no-op if disabled or no path)"""
+    global _exporter
+    path = path or config.METRICS_PROM_FILE
+    if not enabled or not path or _exporter is not None:
+        return
+    interval = interval or config.METRICS_EXPORT_SECONDS
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                write_prometheus(path)
+            except OSError as e:
+                print(f"⚠️ Could not write metrics to {path}: {e}")
+
+    _exporter = threading.Thread(target=run, name="ecospy-metrics", daemon=True)
+    _exporter.start()
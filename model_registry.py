@@ -0,0 +1,123 @@
+# model_registry.py
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from ultralytics import YOLO
+
+import config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# where each inference backend's exported model lives, relative to the PyTorch weights
+BACKEND_PATHS = {
+    "torch": "{stem}.pt",
+    "onnx": "{stem}.onnx",
+    "onnx-int8": "{stem}_int8.onnx",
+    "openvino": "{stem}_openvino_model",
+    "openvino-int8": "{stem}_int8_openvino_model",
+}
+
+_models = {}
+_load_info = {}
+_lock = threading.Lock()
+
+
+def model_path(weights=None, backend=None):
+    """Path of the model for `backend` (default: config.MODEL_BACKEND) exported from `weights`"""
+    weights = weights or config.MODEL_WEIGHTS
+    backend = backend or config.MODEL_BACKEND
+    if backend not in BACKEND_PATHS:
+        raise ValueError(f"Unknown model backend {backend!r}, expected one of {', '.join(BACKEND_PATHS)}")
+    root, _ = os.path.splitext(weights)
+    return BACKEND_PATHS[backend].format(stem=root)
+
+
+def get_model(name=None):
+    """Return the process-wide model for `name` (default: the configured backend),
+    loading and warming it up on first use"""
+    name = name or model_path()
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _lock:
+        if name not in _models:
+            _models[name] = _load(name)
+        return _models[name]
+
+
+def load_model(name=None):
+    """Load a private instance of `name` (not shared): for worker threads that each need their own predictor"""
+    return _load(name or model_path())
+
+
+def _load(name):
+    if not name.endswith(".pt") and not os.path.exists(name):
+        raise FileNotFoundError(f"{name} not found; create it with `python inference_backend.py export`")
+    rss_before = resident_memory_mb()
+    start = time.perf_counter()
+    model = YOLO(name, task="detect")
+    loaded = time.perf_counter()
+
+    # warm-up: the first call pays for lazy initialisation (fusing layers, allocating buffers)
+    model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+    warmed = time.perf_counter()
+
+    _load_info[name] = {
+        "load_seconds": loaded - start,
+        "warmup_seconds": warmed - loaded,
+        "rss_mb": resident_memory_mb(),
+        "rss_delta_mb": resident_memory_mb() - rss_before,
+    }
+    print(f"🧠 Loaded {name} in {loaded - start:.2f}s (warm-up {warmed - loaded:.2f}s)")
+    return model
+
+
+def honours_imgsz(model):
+    """False if `model` runs at one input size whatever imgsz it is called with: static
+    ONNX/OpenVINO exports are pinned to their export size, RemoteModel to the server's"""
+    if hasattr(model, "honours_imgsz"):
+        return model.honours_imgsz
+    backend = getattr(getattr(model, "predictor", None), "model", None)  # set up by the warm-up call
+    if backend is None:
+        return True
+    return getattr(backend, "format", "pt") == "pt" or bool(getattr(backend, "dynamic", False))
+
+
+def load_info(name=None):
+    """Load time, warm-up time and resident memory recorded when `name` was loaded"""
+    return _load_info.get(name or model_path())
+
+
+def resident_memory_mb():
+    """Current resident set size of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        pass
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def report():
+    lines = []
+    for name, info in _load_info.items():
+        lines.append(f"🧠 {name}: load {info['load_seconds']:.2f}s, warm-up {info['warmup_seconds']:.2f}s, "
+                     f"+{info['rss_delta_mb']:.0f} MB (process RSS {info['rss_mb']:.0f} MB)")
+    return "\n".join(lines) or "🧠 No models loaded"
+
+
+if __name__ == "__main__":
+    get_model()
+    print(report())
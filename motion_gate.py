@@ -0,0 +1,54 @@
+# motion_gate.py
+
+import time
+
+import cv2
+
+import config
+
+
+class MotionGate:
+    """Cheap frame-difference check that decides whether a frame needs a fresh inference.
+
+    Frames are compared against the frame of the last inference on a small greyscale
+    copy, so a slow drift still adds up and eventually triggers a new detection.
+    """
+
+    def __init__(self, threshold=None, refresh_interval=None, pixel_delta=None, size=(160, 120)):
+        self.threshold = config.MOTION_THRESHOLD if threshold is None else threshold
+        self.refresh_interval = config.MOTION_REFRESH_SECONDS if refresh_interval is None else refresh_interval
+        self.pixel_delta = config.MOTION_PIXEL_DELTA if pixel_delta is None else pixel_delta
+        self.size = size
+        self._reference = None
+        self._last_infer_time = 0.0
+        self.frames = 0
+        self.skipped = 0
+
+    def should_infer(self, frame):
+        """Return True if `frame` differs enough from the last inferred frame (or the refresh is due)"""
+        self.frames += 1
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        now = time.monotonic()
+        if self._reference is not None and now - self._last_infer_time < self.refresh_interval:
+            diff = cv2.absdiff(gray, self._reference)
+            changed = cv2.countNonZero(cv2.threshold(diff, self.pixel_delta, 255, cv2.THRESH_BINARY)[1])
+            if changed / diff.size < self.threshold:
+                self.skipped += 1
+                return False
+
+        self._reference = gray
+        self._last_infer_time = now
+        return True
+
+    def reset(self):
+        self._reference = None
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def report(self):
+        return (f"🟢 Motion gate skipped {self.skipped}/{self.frames} frames "
+                f"({self.skip_ratio:.1%} of inferences saved)")
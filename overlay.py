@@ -0,0 +1,165 @@
+# overlay.py
+
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+from ultralytics.utils.plotting import colors
+
+import metrics
+
+
+def project_boxes(xyxy, src_shape, dst_shape):
+    """Scale xyxy boxes from an image of `src_shape` (h, w, ...) to one of `dst_shape`"""
+    sy = dst_shape[0] / src_shape[0]
+    sx = dst_shape[1] / src_shape[1]
+    return np.asarray(xyxy, dtype=np.float32) * np.array([sx, sy, sx, sy], dtype=np.float32)
+
+
+def draw_detections(image, xyxy, cls_ids, confs, names, line_width=None):
+    """Draw labelled boxes onto `image` in place (same palette and line width as ultralytics' plot())"""
+    line_width = line_width or max(round(sum(image.shape[:2]) / 2 * 0.003), 2)
+    font_scale = max(line_width / 3, 0.5)
+    for (x1, y1, x2, y2), cls_id, conf in zip(xyxy.astype(int), cls_ids, confs):
+        color = colors(int(cls_id), True)
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, line_width, cv2.LINE_AA)
+
+        label = f"{names[int(cls_id)]} {conf:.2f}"
+        (tw, th), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)
+        top = max(y1 - th - baseline - 2, 0)
+        cv2.rectangle(image, (x1, top), (x1 + tw + 4, top + th + baseline + 2), color, -1)
+        cv2.putText(image, label, (x1 + 2, top + th + 1), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (255, 255, 255), 1, cv2.LINE_AA)
+    return image
+
+
+class FramePresenter:
+    """Draws preview frames into reusable buffers and shows them through one persistent PhotoImage.
+
+    render() runs on the inference worker: resize, boxes and colour conversion all
+    write into preallocated arrays, cycling through three RGBA buffers so the worker
+    never overwrites the one Tk is reading. present() runs on the Tk thread and
+    pastes the newest buffer into the same PhotoImage instead of building a new one.
+    """
+
+    def __init__(self, width, height, buffers=3):
+        self.size = (width, height)
+        self.shape = (height, width)
+        self._scratch = np.empty((height, width, 3), dtype=np.uint8)
+        self._buffers = [np.empty((height, width, 4), dtype=np.uint8) for _ in range(buffers)]
+        # zero-copy PIL views over the RGBA buffers
+        self._images = [Image.frombuffer("RGBA", self.size, buf, "raw", "RGBA", 0, 1) for buf in self._buffers]
+        self._lock = threading.Lock()
+        self._published = None
+        self._reading = None
+        self.photo = None
+
+    def render(self, frame, xyxy=None, cls_ids=None, confs=None, names=None):
+        """Draw `frame` (BGR, any size) and screen-space boxes into the next free buffer"""
+        with self._lock:
+            idx = next(i for i in range(len(self._buffers)) if i not in (self._published, self._reading))
+        with metrics.span("resize"):
+            cv2.resize(frame, self.size, dst=self._scratch)
+        if xyxy is not None and len(xyxy):
+            with metrics.span("draw"):
+                draw_detections(self._scratch, xyxy, cls_ids, confs, names)
+        with metrics.span("convert"):
+            cv2.cvtColor(self._scratch, cv2.COLOR_BGR2RGBA, dst=self._buffers[idx])
+        with self._lock:
+            self._published = idx
+        return idx
+
+    def present(self, label):
+        """Show the newest rendered buffer in `label`; returns False if nothing was rendered yet"""
+        with self._lock:
+            idx = self._published
+            if idx is None:
+                return False
+            self._reading = idx
+        try:
+            if self.photo is None:
+                self.photo = ImageTk.PhotoImage("RGBA", self.size)
+            if label.cget("image") != str(self.photo):
+                label.configure(image=self.photo)
+            with metrics.span("blit"):
+                self.photo.paste(self._images[idx])
+        finally:
+            with self._lock:
+                self._reading = None
+        return True
+
+
+def _bench(width, height, frames, with_tk):
+    """Per-frame time and Python-visible allocations of the old plot() path vs FramePresenter"""
+    import time
+    import tracemalloc
+
+    import torch
+    from ultralytics.engine.results import Results
+
+    rng = np.random.default_rng(0)
+    names = {i: f"class{i}" for i in range(80)}
+    camera = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    raw = np.array([[60, 80, 300, 400, 0.91, 39], [320, 120, 600, 460, 0.84, 41], [10, 10, 120, 200, 0.55, 0]],
+                   dtype=np.float32)
+
+    root = label = None
+    if with_tk:
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+        label = tk.Label(root)
+
+    def old_path():
+        frame_full = cv2.resize(camera, (width, height))
+        boxes = raw.copy()
+        boxes[:, :4] = project_boxes(raw[:, :4], camera.shape, frame_full.shape)
+        result = Results(frame_full, path="bench", names=names, boxes=torch.from_numpy(boxes))
+        temp = result.new()
+        temp.boxes = result.boxes
+        rgb = cv2.cvtColor(temp.plot(), cv2.COLOR_BGR2RGB)
+        img = Image.fromarray(rgb)
+        if label is not None:
+            imgtk = ImageTk.PhotoImage(img)
+            label.configure(image=imgtk)
+            label.imgtk = imgtk
+
+    presenter = FramePresenter(width, height)
+    xyxy = project_boxes(raw[:, :4], camera.shape, presenter.shape)
+
+    def new_path():
+        presenter.render(camera, xyxy, raw[:, 5], raw[:, 4], names)
+        if label is not None:
+            presenter.present(label)
+
+    report = {}
+    for name, step in (("plot+PhotoImage", old_path), ("FramePresenter", new_path)):
+        step()  # warm-up
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(frames):
+            step()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(stat.size for stat in snapshot.statistics("filename"))
+        report[name] = {"ms_per_frame": elapsed / frames * 1000, "peak_traced_mb": peak / 1e6,
+                        "retained_kb": allocated / 1e3}
+    if root is not None:
+        root.destroy()
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the preview presentation path")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--no-tk", action="store_true", help="skip the Tk blit (e.g. without a display)")
+    args = parser.parse_args()
+    print(json.dumps(_bench(args.width, args.height, args.frames, not args.no_tk), indent=2))
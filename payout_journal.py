@@ -0,0 +1,185 @@
+# payout_journal.py
+
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import config
+import metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payouts (
+    key          TEXT PRIMARY KEY,
+    user_path    TEXT NOT NULL,
+    points       REAL NOT NULL,
+    weight       REAL NOT NULL,
+    waste_type   TEXT NOT NULL,
+    collected_at TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'pending',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    last_error   TEXT
+);
+CREATE INDEX IF NOT EXISTS payouts_pending ON payouts (status, collected_at);
+"""
+
+
+class PayoutJournal:
+    """Durable local queue of payouts, pushed to Firestore by a background flusher.
+
+    record() commits the payout to SQLite (WAL mode, fsync'd) and returns at once,
+    so the kiosk can confirm the payout without waiting for the network. The
+    flusher commits pending entries in batches through `commit` (main.commit_payouts);
+    every entry carries an idempotency key, so a batch that is retried after a lost
+    acknowledgement is never applied twice. `on_committed(payouts)` is called with
+    the entries each flush confirmed. Confirmed entries are kept for
+    PAYOUT_KEEP_DONE_DAYS, then pruned, so the journal stays bounded; the queue
+    depth is exported as the payout_queue_depth gauge.
+    """
+
+    def __init__(self, db, commit, path=None, batch_size=None, on_committed=None):
+        self.db = db
+        self.commit = commit
+        self.on_committed = on_committed
+        self.batch_size = batch_size or config.PAYOUT_FLUSH_BATCH
+        self._conn = sqlite3.connect(path or config.PAYOUT_JOURNAL_PATH, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.flushed = 0
+        self.last_flush_ms = None
+        self.last_error = None
+        metrics.gauge("payout_queue_depth", self.pending)
+        metrics.gauge("payout_failed", self.failed)
+
+    def record(self, user_ref, total_payout, total_weight, waste_type):
+        """Durably journal a payout and return its idempotency key"""
+        key = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO payouts (key, user_path, points, weight, waste_type, collected_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, user_ref.path, total_payout, total_weight, waste_type, datetime.utcnow().isoformat()))
+        self._wake.set()
+        return key
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, name="ecospy-journal", daemon=True)
+            self._thread.start()
+
+    def pending(self):
+        """Number of journaled payouts not yet confirmed by Firestore"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM payouts WHERE status = 'pending'").fetchone()[0]
+
+    def stats(self):
+        return {"pending": self.pending(), "failed": self.failed(), "flushed": self.flushed,
+                "last_flush_ms": self.last_flush_ms, "last_error": self.last_error}
+
+    def failed(self):
+        """Number of payouts parked after PAYOUT_MAX_ATTEMPTS permanent failures (need a manual look)"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM payouts WHERE status = 'failed'").fetchone()[0]
+
+    def flush_once(self):
+        """Push one batch of pending payouts; returns how many were committed.
+
+        If the batch as a whole is rejected, its entries are retried one by one so a
+        single bad entry (e.g. a deleted user) cannot hold back the rest; an entry that
+        keeps failing is parked as 'failed' after PAYOUT_MAX_ATTEMPTS tries. Transient
+        errors (backend unreachable) are raised without counting against any entry.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, user_path, points, weight, waste_type, collected_at FROM payouts "
+                "WHERE status = 'pending' ORDER BY collected_at LIMIT ?", (self.batch_size,)).fetchall()
+        if not rows:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            self.commit(self.db, [self._payout(row) for row in rows])
+            committed = rows
+        except Exception as e:
+            if _is_transient(e):
+                self.last_error = str(e)
+                raise
+            if len(rows) == 1:
+                self._failed_attempt(rows, e)
+                raise
+            committed = self._commit_one_by_one(rows)
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        metrics.observe("payout_flush", self.last_flush_ms / 1000)
+        self.last_error = None
+
+        cutoff = (datetime.utcnow() - timedelta(days=config.PAYOUT_KEEP_DONE_DAYS)).isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE payouts SET status = 'done', last_error = NULL WHERE key = ?",
+                                   [(row[0],) for row in committed])
+            self._conn.execute("DELETE FROM payouts WHERE status = 'done' AND collected_at < ?", (cutoff,))
+        self.flushed += len(committed)
+        if self.on_committed:
+            self.on_committed([self._payout(row) for row in committed])
+        print(f"📤 Flushed {len(committed)} payouts in {self.last_flush_ms:.0f} ms ({self.pending()} pending)")
+        return len(committed)
+
+    def _commit_one_by_one(self, rows):
+        committed, error = [], None
+        for row in rows:
+            try:
+                self.commit(self.db, [self._payout(row)])
+                committed.append(row)
+            except Exception as e:
+                if _is_transient(e):
+                    raise
+                error = e
+                self._failed_attempt([row], e)
+        if not committed and error is not None:
+            raise error
+        return committed
+
+    def _payout(self, row):
+        key, user_path, points, weight, waste_type, collected_at = row
+        return {"key": key, "user_ref": self.db.document(user_path), "points": points, "weight": weight,
+                "waste_type": waste_type, "collected_at": collected_at}
+
+    def _failed_attempt(self, rows, error):
+        self.last_error = str(error)
+        with self._lock, self._conn:
+            for row in rows:
+                self._conn.execute(
+                    "UPDATE payouts SET attempts = attempts + 1, last_error = ?, "
+                    "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE status END WHERE key = ?",
+                    (str(error), config.PAYOUT_MAX_ATTEMPTS, row[0]))
+                status = self._conn.execute("SELECT status FROM payouts WHERE key = ?", (row[0],)).fetchone()[0]
+                if status == "failed":
+                    print(f"🚫 Payout {row[0]} for {row[1]} parked after {config.PAYOUT_MAX_ATTEMPTS} attempts: {error}")
+
+    def _flush_loop(self):
+        delay = 1.0
+        while True:
+            self._wake.clear()
+            try:
+                while self.flush_once():
+                    pass
+                delay = 1.0
+                self._wake.wait(timeout=60)
+            except Exception as e:
+                print(f"⚠️ Payout flush failed ({self.pending()} pending), retrying in {delay:.0f}s: {e}")
+                time.sleep(delay * random.uniform(0.8, 1.2))
+                delay = min(delay * 2, config.PAYOUT_RETRY_MAX_SECONDS)
+
+
+# google.api_core exception names that mean "try again later", not "this payout is bad"
+_TRANSIENT_ERRORS = {"ServiceUnavailable", "DeadlineExceeded", "Aborted", "ResourceExhausted",
+                     "InternalServerError", "RetryError", "TooManyRequests", "GatewayTimeout"}
+
+
+def _is_transient(error):
+    return isinstance(error, (OSError, TimeoutError)) or type(error).__name__ in _TRANSIENT_ERRORS
@@ -0,0 +1,96 @@
+# pricing_cache.py
+
+import threading
+import time
+
+import config
+
+COLLECTION = "recyclable_items"
+
+
+class PricingCache:
+    """In-memory copy of the `recyclable_items` collection.
+
+    The whole table is loaded with one collection query and kept for `ttl` seconds.
+    A snapshot listener replaces it whenever prices change in Firestore, so a
+    payout normally needs no network reads at all.
+    """
+
+    def __init__(self, db, ttl=None, listen=True):
+        self.db = db
+        self.ttl = config.PRICING_TTL_SECONDS if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._items = None
+        self._loaded_at = 0.0
+        self._watch = None
+        self.hits = 0
+        self.misses = 0
+        self.reads = 0
+        if listen:
+            self._start_listener()
+
+    def get(self, item):
+        """Return the pricing dict for `item`, or None if it is not in the table"""
+        with self._lock:
+            fresh = self._items is not None and time.monotonic() - self._loaded_at < self.ttl
+            if fresh:
+                self.hits += 1
+                return self._items.get(item)
+            self.misses += 1
+        # use the table this refresh loaded: a concurrent invalidate() may clear self._items
+        return self.refresh().get(item)
+
+    def refresh(self):
+        """Reload the whole table with a single query and return it"""
+        docs = self.db.collection(COLLECTION).get()
+        items = {doc.id: doc.to_dict() for doc in docs}
+        with self._lock:
+            self._items = items
+            self._loaded_at = time.monotonic()
+            self.reads += max(len(docs), 1)
+        return items
+
+    def invalidate(self):
+        with self._lock:
+            self._items = None
+
+    def close(self):
+        if self._watch:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "reads": self.reads,
+                    "items": len(self._items or {})}
+
+    def report(self):
+        stats = self.stats()
+        return (f"💲 Pricing cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['reads']} document reads, {stats['items']} items cached")
+
+    def _start_listener(self):
+        try:
+            self._watch = self.db.collection(COLLECTION).on_snapshot(self._on_snapshot)
+        except Exception as e:
+            print(f"⚠️ Pricing listener unavailable, falling back to TTL only: {e}")
+
+    def _on_snapshot(self, col_snapshot, changes, read_time):
+        # the snapshot always carries the full collection, so it replaces the cache outright
+        items = {doc.id: doc.to_dict() for doc in col_snapshot}
+        with self._lock:
+            self._items = items
+            self._loaded_at = time.monotonic()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_pricing_cache(db):
+    """Return the process-wide PricingCache for `db`"""
+    with _caches_lock:
+        cache = _caches.get(id(db))
+        if cache is None:
+            cache = _caches[id(db)] = PricingCache(db)
+        return cache
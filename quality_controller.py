@@ -0,0 +1,127 @@
+# quality_controller.py
+
+import os
+import time
+
+import config
+
+
+def quality_levels(imgsz=None, imgsz_steps=None, max_stride=None, conf_steps=None, scale_imgsz=True):
+    """Settings from best to cheapest as (stride, imgsz, conf): first run inference on fewer
+    frames, then shrink the input, then raise the confidence threshold.
+
+    Pass scale_imgsz=False for a model that ignores imgsz (model_registry.honours_imgsz),
+    so no level claims a smaller input it wouldn't get.
+    """
+    imgsz = imgsz or config.INFERENCE_IMGSZ
+    imgsz_steps = [s for s in (imgsz_steps or config.QUALITY_IMGSZ_STEPS) if s < imgsz] if scale_imgsz else []
+    conf_steps = list(conf_steps or config.QUALITY_CONF_STEPS)
+    max_stride = max_stride or config.QUALITY_MAX_STRIDE
+
+    levels = [(stride, imgsz, conf_steps[0]) for stride in range(1, max_stride + 1)]
+    levels += [(max_stride, size, conf_steps[0]) for size in sorted(imgsz_steps, reverse=True)]
+    smallest = levels[-1][1]
+    levels += [(max_stride, smallest, conf) for conf in conf_steps[1:]]
+    return levels
+
+
+class QualityController:
+    """Feedback loop that holds the live preview at a target frame rate within a CPU budget.
+
+    The inference worker reports every frame it finishes and how long it was busy
+    with it; once per window the controller compares the achieved FPS and the
+    process CPU share against the targets and moves one step along quality_levels().
+    A low FPS only counts against quality while the worker is saturated: when it is
+    waiting on the camera, cheaper inference would not help. It degrades as soon as
+    a window misses, but only upgrades after `calm_windows` windows with headroom,
+    so it doesn't oscillate around the target.
+    """
+
+    def __init__(self, target_fps=None, cpu_budget=None, window=None, levels=None, calm_windows=2):
+        self.target_fps = target_fps or config.QUALITY_TARGET_FPS
+        self.cpu_budget = cpu_budget or config.QUALITY_CPU_BUDGET
+        self.window = window or config.QUALITY_WINDOW_SECONDS
+        self.levels = levels or quality_levels()
+        self.calm_windows = calm_windows
+        self.level = 0
+        self.adjustments = 0
+        self._cpus = os.cpu_count() or 1
+        self._calm = 0
+        self._since_infer = 0
+        self.restart()
+
+    @property
+    def stride(self):
+        return self.levels[self.level][0]
+
+    @property
+    def imgsz(self):
+        return self.levels[self.level][1]
+
+    @property
+    def conf(self):
+        return self.levels[self.level][2]
+
+    @property
+    def frame_interval_ms(self):
+        """How often the display loop should poll for a new frame"""
+        return max(5, int(1000 / self.target_fps / 2))
+
+    def restart(self):
+        """Start a fresh measurement window (call when the camera starts; idle time doesn't count)"""
+        self._since_infer = 0
+        self._frames = 0
+        self._busy = 0.0
+        self._window_start = time.monotonic()
+        self._cpu_start = time.process_time()
+
+    def should_infer(self):
+        """True on every `stride`-th frame; other frames re-render the last results"""
+        self._since_infer += 1
+        if self._since_infer >= self.stride:
+            self._since_infer = 0
+            return True
+        return False
+
+    def frame_done(self, busy_seconds=0.0):
+        """Record one finished frame and the worker time it took; re-evaluates the settings when the window is over"""
+        self._frames += 1
+        self._busy += busy_seconds
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+        fps = self._frames / elapsed
+        cpu = (time.process_time() - self._cpu_start) / elapsed / self._cpus
+        saturated = self._busy / elapsed > 0.8
+        self._frames = 0
+        self._busy = 0.0
+        self._window_start = now
+        self._cpu_start = time.process_time()
+
+        if (fps < self.target_fps * 0.9 and saturated) or cpu > self.cpu_budget:
+            self._calm = 0
+            if self.level < len(self.levels) - 1:
+                self._move(+1, fps, cpu)
+        elif (fps > self.target_fps * 1.1 or not saturated) and cpu < self.cpu_budget * 0.8:
+            self._calm += 1
+            if self._calm >= self.calm_windows and self.level > 0:
+                self._calm = 0
+                self._move(-1, fps, cpu)
+        else:
+            self._calm = 0
+
+    def _move(self, step, fps, cpu):
+        before = self.levels[self.level]
+        self.level += step
+        after = self.levels[self.level]
+        self.adjustments += 1
+        changes = ", ".join(f"{name} {a}→{b}" for name, a, b in zip(("stride", "imgsz", "conf"), before, after)
+                            if a != b)
+        print(f"🎚️ Quality {'down' if step > 0 else 'up'}: {changes} "
+              f"(fps {fps:.1f}/{self.target_fps:g}, cpu {cpu:.0%}/{self.cpu_budget:.0%})")
+
+    def report(self):
+        stride, imgsz, conf = self.levels[self.level]
+        return (f"🎚️ Quality level {self.level}/{len(self.levels) - 1} (stride {stride}, imgsz {imgsz}, "
+                f"conf {conf}) after {self.adjustments} adjustments")
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the payout code runs against the in-memory Firestore; must be set before config is imported
+os.environ.setdefault("ECOSPY_FIRESTORE_BACKEND", "memory")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
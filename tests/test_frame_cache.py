@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from frame_cache import DetectionMemo, NearDuplicateIndex
+
+
+def flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 6, 15])
+def test_finds_every_hash_within_max_distance(max_distance):
+    rng = random.Random(max_distance)
+    index = NearDuplicateIndex(max_distance)
+    stored = rng.getrandbits(64)
+    index.add(stored, "first")
+
+    for _ in range(200):
+        near = flip(stored, rng.sample(range(64), max_distance))
+        assert index.find(near) == (stored, "first")
+    assert index.find(flip(stored, range(max_distance + 1))) is None
+
+
+def test_match_can_require_the_payload_to_agree():
+    index = NearDuplicateIndex(4)
+    index.add(0b1011, ("1.jpg", {"bottle": 2}))
+
+    assert index.find(0b1010, lambda p: p[1] == {"bottle": 2}) == (0b1011, ("1.jpg", {"bottle": 2}))
+    assert index.find(0b1010, lambda p: p[1] == {"bottle": 3}) is None
+
+
+@pytest.mark.parametrize("max_distance", [-1, 16, 64])
+def test_rejects_distances_the_bands_cannot_guarantee(max_distance):
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(max_distance)
+
+
+def test_memo_file_is_compacted_to_live_entries(tmp_path):
+    path = str(tmp_path / "memo.jsonl")
+    memo = DetectionMemo(path, maxsize=10)
+    for i in range(2500):
+        memo.put(f"image{i}:torch:yolov8n.pt:640", ["bottle"])
+
+    with open(path, encoding="utf-8") as f:
+        assert sum(1 for _ in f) <= 2000
+    reloaded = DetectionMemo(path, maxsize=10)
+    assert reloaded.get("image2499:torch:yolov8n.pt:640") == ["bottle"]
+    assert reloaded.get("image0:torch:yolov8n.pt:640") is None
@@ -0,0 +1,137 @@
+import pytest
+
+from fake_firestore import FakeFirestore
+from main import commit_payouts
+from payout_journal import PayoutJournal
+
+
+@pytest.fixture
+def db():
+    db = FakeFirestore()
+    db.load({
+        "users/alice": {"name": "Alice", "ecopoints": 10, "wastecollected": 1.0, "historyCount": 0},
+        "users/bob": {"name": "Bob", "ecopoints": 0, "wastecollected": 0.0, "historyCount": 0},
+    })
+    return db
+
+
+def payout(db, user, points, weight, key=None):
+    return {"user_ref": db.document(f"users/{user}"), "points": points, "weight": weight,
+            "waste_type": "Plastic", "key": key}
+
+
+def history(db, user):
+    return {doc.id: doc.to_dict() for doc in db.collection(f"users/{user}/wasteHistory").get()}
+
+
+def test_retried_batch_is_applied_once(db):
+    batch = [payout(db, "alice", 5, 0.5, key="k1"), payout(db, "bob", 3, 0.2, key="k2")]
+
+    assert commit_payouts(db, batch) == [(1.5, 15), (0.2, 3)]
+    assert commit_payouts(db, batch) == [None, None]
+
+    assert db.document("users/alice").get().to_dict()["ecopoints"] == 15
+    assert db.document("users/bob").get().to_dict()["ecopoints"] == 3
+    assert list(history(db, "alice")) == ["DOC001"]
+    assert db.document("users/alice/payoutKeys/k1").get().to_dict()["historyId"] == "DOC001"
+
+
+def test_several_payouts_for_one_user_in_one_batch(db):
+    batch = [payout(db, "alice", 5, 0.5, key="k1"), payout(db, "alice", 2, 0.25, key="k2"),
+             payout(db, "bob", 1, 0.1, key="k3")]
+
+    totals = commit_payouts(db, batch)
+
+    assert totals == [(1.5, 15), (1.75, 17), (0.1, 1)]
+    alice = db.document("users/alice").get().to_dict()
+    assert (alice["ecopoints"], alice["wastecollected"], alice["historyCount"]) == (17, 1.75, 2)
+    assert {doc_id: doc["pointsEarned"] for doc_id, doc in history(db, "alice").items()} == {"DOC001": 5, "DOC002": 2}
+
+
+def test_already_applied_key_is_skipped_next_to_new_payouts(db):
+    commit_payouts(db, [payout(db, "alice", 5, 0.5, key="k1")])
+
+    assert commit_payouts(db, [payout(db, "alice", 5, 0.5, key="k1"), payout(db, "alice", 1, 0.1, key="k2")]) \
+        == [None, (1.6, 16)]
+    assert sorted(history(db, "alice")) == ["DOC001", "DOC002"]
+
+
+def test_legacy_user_history_count_is_seeded_once(db):
+    db.load({
+        "users/carol": {"name": "Carol", "ecopoints": 4, "wastecollected": 0.4},
+        "users/carol/wasteHistory/DOC001": {"pointsEarned": 2},
+        "users/carol/wasteHistory/DOC002": {"pointsEarned": 2},
+    })
+
+    commit_payouts(db, [payout(db, "carol", 1, 0.1, key="k1")])
+    assert db.document("users/carol").get().to_dict()["historyCount"] == 3
+    assert "DOC003" in history(db, "carol")
+
+    commit_payouts(db, [payout(db, "carol", 1, 0.1, key="k2")])
+    assert db.document("users/carol").get().to_dict()["historyCount"] == 4
+    assert sorted(history(db, "carol")) == ["DOC001", "DOC002", "DOC003", "DOC004"]
+
+
+def test_journal_retry_after_lost_acknowledgement_applies_once(db, tmp_path):
+    calls = []
+
+    def commit_then_lose_ack(db, payouts):
+        result = commit_payouts(db, payouts)
+        calls.append(len(payouts))
+        if len(calls) == 1:
+            raise ConnectionError("acknowledgement lost")
+        return result
+
+    journal = PayoutJournal(db, commit_then_lose_ack, path=str(tmp_path / "journal.db"))
+    journal.record(db.document("users/alice"), 5, 0.5, "Plastic")
+
+    with pytest.raises(ConnectionError):
+        journal.flush_once()
+    assert journal.pending() == 1
+
+    assert journal.flush_once() == 1
+    assert journal.pending() == 0
+    assert db.document("users/alice").get().to_dict()["ecopoints"] == 15
+    assert list(history(db, "alice")) == ["DOC001"]
+
+
+def test_journal_parks_an_entry_that_keeps_failing(db, tmp_path, monkeypatch):
+    monkeypatch.setattr("config.PAYOUT_MAX_ATTEMPTS", 2)
+    journal = PayoutJournal(db, commit_payouts, path=str(tmp_path / "journal.db"))
+    journal.record(db.document("users/alice"), 5, 0.5, "Plastic")
+    journal.record(db.document("users/deleted"), 5, 0.5, "Plastic")
+    journal.record(db.document("users/bob"), 3, 0.3, "Plastic")
+
+    assert journal.flush_once() == 2
+    with pytest.raises(KeyError):
+        journal.flush_once()
+
+    assert journal.stats()["pending"] == 0
+    assert journal.stats()["failed"] == 1
+    assert db.document("users/bob").get().to_dict()["ecopoints"] == 3
+    assert history(db, "deleted") == {}
+
+
+def test_journaled_payout_shows_in_lookups_until_confirmed(db, tmp_path):
+    from user_lookup import UserResolver
+
+    resolver = UserResolver(db)
+    journal = PayoutJournal(db, commit_payouts, path=str(tmp_path / "journal.db"), on_committed=resolver.settle)
+    db.document("users/alice").update({"email": "alice@example.com"})
+    assert resolver.resolve("alice@example.com")[1]["ecopoints"] == 10
+
+    journal.record(db.document("users/alice"), 5, 0.5, "Plastic")
+    resolver.add_unconfirmed(db.document("users/alice"), 5, 0.5)
+    assert resolver.resolve("alice@example.com")[1]["ecopoints"] == 15
+
+    journal.flush_once()
+    assert resolver.resolve("alice@example.com")[1]["ecopoints"] == 15
+
+
+def test_journal_prunes_confirmed_entries(db, tmp_path, monkeypatch):
+    monkeypatch.setattr("config.PAYOUT_KEEP_DONE_DAYS", 0)
+    journal = PayoutJournal(db, commit_payouts, path=str(tmp_path / "journal.db"))
+    journal.record(db.document("users/alice"), 5, 0.5, "Plastic")
+
+    assert journal.flush_once() == 1
+    assert journal._conn.execute("SELECT COUNT(*) FROM payouts").fetchone()[0] == 0
@@ -1,6 +1,7 @@
 # transaction_module.py
 
 from firebase_admin import firestore
+from pricing_cache import get_pricing_cache
 
 def process_transaction(db, recyclable_items, account_no):
     # Find user by account number
@@ -17,10 +18,11 @@ def process_transaction(db, recyclable_items, account_no):
 
     # Calculate total payout
     total_payout = 0
+    pricing = get_pricing_cache(db)
     for item, qty in recyclable_items.items():
-        price_doc = db.collection("recyclable_items").document(item).get()
-        if price_doc.exists:
-            price = price_doc.to_dict().get("price", 0)
+        data = pricing.get(item)
+        if data is not None:
+            price = data.get("price", 0)
             total_payout += price * qty
 
     print(f"\n👤 User: {user_name} (Acc No: {account_no})")
@@ -0,0 +1,158 @@
+# user_lookup.py
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+ALLOWED_FIELDS = ["name", "email", "phone", "mobile", "ecopoints", "wastecollected"]
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ecospy-lookup")
+
+
+def normalize_identifier(user_input):
+    """Return (fields, candidates, key) to query for a typed email or mobile number.
+
+    An email only needs the `email` field. Anything else is treated as a phone
+    number and matched against both `phone` and `mobile` using the common ways
+    it may have been stored (as typed, digits only, last 10 digits, as a number).
+    `key` is the normalized form used for caching.
+    """
+    value = user_input.strip()
+    if "@" in value:
+        return ["email"], _unique([value, value.lower()]), value.lower()
+
+    digits = re.sub(r"\D", "", value)
+    candidates = [value, digits, digits[-10:]]
+    if digits:
+        candidates.append(int(digits))
+    return ["phone", "mobile"], _unique(c for c in candidates if c != ""), digits[-10:] or value
+
+
+def clean_user_data(user_data):
+    """Fix the legacy `mobilemobile` key and keep only the fields the kiosk shows"""
+    if "mobilemobile" in user_data:
+        user_data["mobile"] = user_data.pop("mobilemobile")
+    return {k: v for k, v in user_data.items() if k in ALLOWED_FIELDS}
+
+
+def _unique(values):
+    seen = []
+    for v in values:
+        if v not in seen:
+            seen.append(v)
+    return seen
+
+
+class UserResolver:
+    """Resolves an email/mobile to a user with at most one round-trip of concurrent queries.
+
+    Recently resolved users are kept in a small LRU for `ttl` seconds so a repeat
+    visitor at the same kiosk resolves without touching the network. Payouts that
+    are journaled but not yet in Firestore (add_unconfirmed) are added to the
+    balance returned, until the journal reports them committed (settle).
+    """
+
+    def __init__(self, db, cache_size=None, ttl=None):
+        self.db = db
+        self.cache_size = config.USER_CACHE_SIZE if cache_size is None else cache_size
+        self.ttl = config.USER_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._cache = OrderedDict()
+        self._unconfirmed = {}  # user path -> [points, weight] journaled but not yet in Firestore
+        self._lock = threading.Lock()
+
+    def resolve(self, user_input):
+        """Return (user_ref, user_data) for the matching user, or None"""
+        fields, candidates, key = normalize_identifier(user_input)
+        if not candidates:
+            return None
+
+        cached = self._cache_get(key)
+        if cached:
+            return self._with_unconfirmed(*cached)
+
+        users_ref = self.db.collection("users")
+        futures = [_executor.submit(users_ref.where(field, "in", candidates).limit(1).get)
+                   for field in fields]
+        # keep the field priority (email, then phone, then mobile) when several match
+        for future in futures:
+            query = future.result()
+            if query:
+                user_doc = query[0]
+                found = (user_doc.reference, clean_user_data(user_doc.to_dict()))
+                self._cache_put(key, found)
+                return self._with_unconfirmed(found[0], dict(found[1]))
+        return None
+
+    def add_unconfirmed(self, user_ref, points, weight):
+        """Count a journaled payout in `user_ref`'s balance until Firestore confirms it"""
+        with self._lock:
+            delta = self._unconfirmed.setdefault(user_ref.path, [0, 0.0])
+            delta[0] += points
+            delta[1] += weight
+
+    def settle(self, payouts):
+        """Payouts (dicts with user_ref, points, weight) are now in Firestore: stop adding
+        them and re-read those users on their next lookup"""
+        with self._lock:
+            for payout in payouts:
+                path = payout["user_ref"].path
+                delta = self._unconfirmed.get(path)
+                if delta:
+                    delta[0] -= payout["points"]
+                    delta[1] -= payout["weight"]
+                    if abs(delta[0]) < 1e-9 and abs(delta[1]) < 1e-9:
+                        del self._unconfirmed[path]
+                for key in [k for k, (found, _) in self._cache.items() if found[0].path == path]:
+                    del self._cache[key]
+
+    def _with_unconfirmed(self, user_ref, user_data):
+        with self._lock:
+            delta = self._unconfirmed.get(user_ref.path)
+        if delta:
+            user_data["ecopoints"] = user_data.get("ecopoints", 0) + delta[0]
+            user_data["wastecollected"] = user_data.get("wastecollected", 0) + delta[1]
+        return user_ref, user_data
+
+    def forget(self, user_ref):
+        """Drop cached entries for `user_ref`, e.g. after its balance changed"""
+        with self._lock:
+            for key in [k for k, (found, _) in self._cache.items() if found[0].path == user_ref.path]:
+                del self._cache[key]
+
+    def _cache_get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            found, stamp = entry
+            if time.monotonic() - stamp > self.ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return found[0], dict(found[1])
+
+    def _cache_put(self, key, found):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (found, time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_user_resolver(db):
+    """Return the process-wide UserResolver for `db`"""
+    with _resolvers_lock:
+        resolver = _resolvers.get(id(db))
+        if resolver is None:
+            resolver = _resolvers[id(db)] = UserResolver(db)
+        return resolver
@@ -1,9 +1,77 @@
 # waste_mapping.py
 
+import threading
+from collections import Counter
+
+import numpy as np
+
+RECYCLABLE_ITEMS = frozenset(["bottle", "cup", "paper", "book", "plastic"])
+
+
 def check_recyclability(item_name: str) -> str:
-    recyclable_items = ["bottle", "cup", "paper", "book", "plastic"]
-    
-    if item_name.lower() in recyclable_items:
+    if item_name.lower() in RECYCLABLE_ITEMS:
         return "Recyclable"
     else:
         return "Non-Recyclable"
+
+
+class ClassLookup:
+    """Recyclability and allowed-class tables indexed by class id, compiled once per model `names`"""
+
+    def __init__(self, names):
+        self.size = max(names) + 1 if names else 0
+        self.labels = np.array([str(names.get(i, "")).lower() for i in range(self.size)], dtype=object)
+        self.recyclable = np.array([label in RECYCLABLE_ITEMS for label in self.labels], dtype=bool)
+        self._allowed = {}
+
+    def allowed_mask(self, allowed):
+        """Boolean table: True for class ids whose label is in `allowed` (cached per set)"""
+        key = frozenset(a.lower() for a in allowed)
+        mask = self._allowed.get(key)
+        if mask is None:
+            mask = self._allowed[key] = np.array([label in key for label in self.labels], dtype=bool)
+        return mask
+
+
+_lookups = {}
+_lookups_lock = threading.Lock()
+
+
+def get_class_lookup(names):
+    """Return the ClassLookup for a model's `names` dict (the same dict object every frame)"""
+    entry = _lookups.get(id(names))
+    if entry is not None and entry[0] is names:
+        return entry[1]
+    with _lookups_lock:
+        lookup = ClassLookup(names)
+        _lookups[id(names)] = (names, lookup)
+        return lookup
+
+
+def class_ids(result):
+    return result.boxes.cls.cpu().numpy().astype(np.intp)
+
+
+def summarize_detections(result, allowed=None):
+    """Return all detected labels and a recyclable label -> count dict for one YOLO result.
+
+    With `allowed`, boxes whose label is not in that set are ignored.
+    """
+    lookup = get_class_lookup(result.names)
+    cls = class_ids(result)
+    if allowed is not None:
+        cls = cls[lookup.allowed_mask(allowed)[cls]]
+
+    counts = np.bincount(cls[lookup.recyclable[cls]], minlength=lookup.size)
+    recyclable_items = {lookup.labels[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+    return lookup.labels[cls].tolist(), recyclable_items
+
+
+def summarize_labels(labels, allowed=None):
+    """summarize_detections() for labels already taken from a result (e.g. memoized ones),
+    so recyclability always follows the current RECYCLABLE_ITEMS"""
+    labels = [str(label).lower() for label in labels]
+    if allowed is not None:
+        keep = {a.lower() for a in allowed}
+        labels = [label for label in labels if label in keep]
+    return labels, dict(Counter(label for label in labels if label in RECYCLABLE_ITEMS))